@@ -1,30 +1,74 @@
 from __future__ import annotations
 
+import cProfile
 import html as html_lib
+import hashlib
+import hmac
 import io
+import marshal
 import math
+import mimetypes
+import os
 import re
+import sys
+import threading
+import time
+import uuid
 import zipfile
 import asyncio
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
 from html.parser import HTMLParser
-from pathlib import PurePosixPath
+from pathlib import Path, PurePosixPath
 from typing import List
 from xml.etree import ElementTree as ET
 
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
 from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse
 from pypdf import PdfReader
 from pydantic import BaseModel
 
 app = FastAPI(title="PivotStream Studio")
-IMPORT_TIMEOUT_SECONDS = 15
+IMPORT_TIMEOUT_SECONDS = float(os.environ.get("PIVOTSTREAM_IMPORT_TIMEOUT", "15"))
+# Extraction stops this long before the hard timeout to leave room for tokenizing and indexing.
+IMPORT_DEADLINE_MARGIN_SECONDS = 2.0
+IMPORT_STATE_CACHE_SIZE = 8
+DOCUMENT_CACHE_SIZE = 16
+SEARCH_RESULT_LIMIT = 50
+SEARCH_CONTEXT_WORDS = 6
+LAZY_BOOK_CACHE_SIZE = 4
+LAZY_PART_CACHE_SIZE = 32
+# scripts/build_static.py writes fingerprinted, precompressed assets here.
+# Serve build/static/ only when asked, so edits to static/ are never shadowed by a stale build.
+STATIC_DIR = Path(os.environ.get("PIVOTSTREAM_STATIC_DIR", "static"))
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+FINGERPRINT_PATTERN = re.compile(r"\.[0-9a-f]{10}\.[A-Za-z0-9]+$")
+PRECOMPRESSED_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# Profiling stays off unless an admin token is configured.
+PROFILE_TOKEN = os.environ.get("PIVOTSTREAM_PROFILE_TOKEN", "")
+PROFILE_CACHE_SIZE = 20
+PROFILE_MAX_DEPTH = 64
+PROFILE_MIN_SHARE = 0.0005
+# Bump whenever tokenization changes so clients drop token caches built by older parsers.
+PARSER_VERSION = "1"
 
 
 class ParseRequest(BaseModel):
     text: str
 
 
+class ContinueImportRequest(BaseModel):
+    # Offsets the client already holds (text_end/token_end of its last response).
+    text_offset: int | None = None
+    token_offset: int | None = None
+
+
 class Token(BaseModel):
     core: str
     prefix: str
@@ -39,6 +83,7 @@ PUNCT_LIGHT = set(",")
 
 APOSTROPHES = {"'", "’"}
 HYPHENS = {"-", "‑"}
+WORD_PATTERN = re.compile(r"\S+")
 BLOCK_TAGS = {
     "p",
     "div",
@@ -201,7 +246,7 @@ def _extract_core(raw: str) -> str:
     return "".join(keep)
 
 
-def _split_token(raw: str) -> Token | None:
+def _split_parts(raw: str) -> tuple[str, str, str] | None:
     if not raw:
         return None
 
@@ -220,6 +265,14 @@ def _split_token(raw: str) -> Token | None:
     core = _extract_core(core_raw)
     if not core:
         return None
+    return prefix, core, suffix
+
+
+def _split_token(raw: str) -> Token | None:
+    parts = _split_parts(raw)
+    if parts is None:
+        return None
+    prefix, core, suffix = parts
 
     orp_index = min(_orp_index(core), len(core) - 1)
     pause_mult = _pause_multiplier(core, suffix)
@@ -277,7 +330,7 @@ def _extract_title(html_source: str) -> str | None:
 def _count_tokens(text: str) -> int:
     count = 0
     for raw in text.split():
-        if _split_token(raw):
+        if _split_parts(raw):
             count += 1
     return count
 
@@ -348,139 +401,474 @@ def _parse_ncx_toc(zf: zipfile.ZipFile, opf_dir: PurePosixPath, ncx_href: str |
     return entries
 
 
-def _extract_epub_data(data: bytes) -> tuple[str, List[dict]]:
+def _parse_range_spec(spec: str | None, upper: int, label: str) -> List[int] | None:
+    # "3-5,8" (1-based, inclusive) -> sorted 0-based indices below upper.
+    if spec is None or not spec.strip():
+        return None
+    selected: set[int] = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        match = re.fullmatch(r"(\d+)\s*(?:-\s*(\d+))?", part)
+        if not match:
+            raise ValueError(f"Invalid {label} range: {part}")
+        first = int(match.group(1))
+        last = int(match.group(2) or first)
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid {label} range: {part}")
+        if first > upper:
+            raise ValueError(f"{label.capitalize()} {first} is out of range (1-{upper})")
+        selected.update(range(first - 1, min(last, upper)))
+    if not selected:
+        raise ValueError(f"Invalid {label} range: {spec}")
+    return sorted(selected)
+
+
+def _load_epub_package(zf: zipfile.ZipFile) -> dict:
+    try:
+        container_xml = zf.read("META-INF/container.xml")
+    except KeyError as exc:
+        raise ValueError("EPUB is missing container.xml") from exc
+
+    root = ET.fromstring(container_xml)
+    rootfile = None
+    for elem in root.iter():
+        if elem.tag.endswith("rootfile"):
+            rootfile = elem.attrib.get("full-path")
+            if rootfile:
+                break
+    if not rootfile:
+        raise ValueError("EPUB rootfile not found")
+
+    opf_data = zf.read(rootfile)
+    opf_root = ET.fromstring(opf_data)
+
+    manifest: dict[str, dict] = {}
+    for item in opf_root.iter():
+        if item.tag.endswith("item"):
+            item_id = item.attrib.get("id")
+            href = item.attrib.get("href")
+            if not item_id or not href:
+                continue
+            manifest[item_id] = {
+                "href": href,
+                "media_type": item.attrib.get("media-type", ""),
+                "properties": item.attrib.get("properties", ""),
+            }
+
+    nav_href = None
+    ncx_href = None
+    for item_id, item in manifest.items():
+        properties = item.get("properties", "")
+        if not nav_href and "nav" in properties.split():
+            nav_href = item.get("href")
+        if not ncx_href and (
+            item.get("media_type") == "application/x-dtbncx+xml" or item_id == "ncx"
+        ):
+            ncx_href = item.get("href")
+
+    spine_ids: List[str] = []
+    for itemref in opf_root.iter():
+        if itemref.tag.endswith("itemref"):
+            idref = itemref.attrib.get("idref")
+            if idref:
+                spine_ids.append(idref)
+
+    if not spine_ids:
+        spine_ids = list(manifest.keys())
+
+    allowed_types = {
+        "application/xhtml+xml",
+        "text/html",
+        "application/x-dtbook+xml",
+    }
+
+    opf_dir = PurePosixPath(rootfile).parent
+    names = set(zf.namelist())
+    spine: List[dict] = []
+    for idref in spine_ids:
+        item = manifest.get(idref)
+        if not item:
+            continue
+        media_type = item.get("media_type", "")
+        if media_type and media_type not in allowed_types:
+            continue
+        href = item.get("href")
+        if not href:
+            continue
+        zip_path = str(opf_dir / PurePosixPath(href))
+        if zip_path not in names:
+            continue
+        spine.append(
+            {
+                "href": href,
+                "zip_path": zip_path,
+                "path": _normalize_posix(zip_path),
+            }
+        )
+
+    toc = _parse_nav_toc(zf, opf_dir, nav_href) or _parse_ncx_toc(zf, opf_dir, ncx_href)
+    spine_path_map = {item["path"]: idx for idx, item in enumerate(spine)}
+    toc_entries = [
+        {**entry, "spine_index": spine_path_map[entry["path"]]}
+        for entry in toc
+        if entry["path"] in spine_path_map
+    ]
+    return {"spine": spine, "toc": toc_entries}
+
+
+def _read_spine_item(zf: zipfile.ZipFile, item: dict) -> dict | None:
+    html_bytes = zf.read(item["zip_path"])
+    try:
+        html_source = html_bytes.decode("utf-8", errors="ignore")
+    except UnicodeDecodeError:
+        html_source = html_bytes.decode("latin-1", errors="ignore")
+    try:
+        text = _html_to_text(html_source)
+        title = _extract_title(html_source)
+    except Exception:
+        return None
+    return {"text": text, "title": title}
+
+
+def _select_epub_spine(package: dict, chapters: List[int] | None, spine: List[int] | None) -> List[int]:
+    total = len(package["spine"])
+    if spine is not None:
+        return spine
+    if chapters is None:
+        return list(range(total))
+    # A TOC entry covers its spine item up to the next entry that starts in a later item.
+    starts = [entry["spine_index"] for entry in package["toc"]] or list(range(total))
+    selected: set[int] = set()
+    for chapter in chapters:
+        start = starts[chapter]
+        end = next((value for value in starts[chapter + 1 :] if value > start), total)
+        selected.update(range(start, max(end, start + 1)))
+    return sorted(selected)
+
+
+def _epub_chapter_count(package: dict) -> int:
+    return len(package["toc"]) or len(package["spine"])
+
+
+def _start_epub_import(data: bytes, chapters: str | None = None, spine: str | None = None) -> dict:
     with zipfile.ZipFile(io.BytesIO(data)) as zf:
-        try:
-            container_xml = zf.read("META-INF/container.xml")
-        except KeyError as exc:
-            raise ValueError("EPUB is missing container.xml") from exc
-
-        root = ET.fromstring(container_xml)
-        rootfile = None
-        for elem in root.iter():
-            if elem.tag.endswith("rootfile"):
-                rootfile = elem.attrib.get("full-path")
-                if rootfile:
-                    break
-        if not rootfile:
-            raise ValueError("EPUB rootfile not found")
-
-        opf_data = zf.read(rootfile)
-        opf_root = ET.fromstring(opf_data)
-
-        manifest: dict[str, dict] = {}
-        for item in opf_root.iter():
-            if item.tag.endswith("item"):
-                item_id = item.attrib.get("id")
-                href = item.attrib.get("href")
-                if not item_id or not href:
-                    continue
-                manifest[item_id] = {
-                    "href": href,
-                    "media_type": item.attrib.get("media-type", ""),
-                    "properties": item.attrib.get("properties", ""),
-                }
-
-        nav_href = None
-        ncx_href = None
-        for item_id, item in manifest.items():
-            properties = item.get("properties", "")
-            if not nav_href and "nav" in properties.split():
-                nav_href = item.get("href")
-            if not ncx_href and (
-                item.get("media_type") == "application/x-dtbncx+xml" or item_id == "ncx"
-            ):
-                ncx_href = item.get("href")
-
-        spine_ids: List[str] = []
-        for itemref in opf_root.iter():
-            if itemref.tag.endswith("itemref"):
-                idref = itemref.attrib.get("idref")
-                if idref:
-                    spine_ids.append(idref)
-
-        if not spine_ids:
-            spine_ids = list(manifest.keys())
-
-        allowed_types = {
-            "application/xhtml+xml",
-            "text/html",
-            "application/x-dtbook+xml",
-        }
+        package = _load_epub_package(zf)
+    chapter_indices = _parse_range_spec(chapters, _epub_chapter_count(package), "chapter")
+    spine_indices = _parse_range_spec(spine, len(package["spine"]), "spine item")
+    return {
+        "kind": "epub",
+        "data": data,
+        "package": package,
+        "selected": _select_epub_spine(package, chapter_indices, spine_indices),
+        "selection": {"chapters": chapters, "spine": spine},
+        "next": 0,
+        "items": {},
+    }
+
+
+def _run_epub_import(state: dict, deadline: float | None = None) -> dict:
+    package = state["package"]
+    selected = state["selected"]
+    items: dict[int, dict] = state["items"]
+    first = state["next"]
+    with zipfile.ZipFile(io.BytesIO(state["data"])) as zf:
+        while state["next"] < len(selected):
+            # Always make progress, then stop at the deadline with a clean prefix.
+            if deadline is not None and state["next"] > first and time.monotonic() >= deadline:
+                break
+            idx = selected[state["next"]]
+            item = _read_spine_item(zf, package["spine"][idx])
+            if item is not None:
+                items[idx] = item
+            state["next"] += 1
+    partial = state["next"] < len(selected)
+
+    full_text = _normalize_text("\n\n".join(item["text"] for item in items.values() if item["text"]))
+    if not full_text and not partial:
+        raise ValueError("EPUB had no readable text")
+
+    # Offsets are relative to the extracted subset, so a partial import starts at 0.
+    starts: dict[int, int] = {}
+    total = 0
+    for idx, item in items.items():
+        starts[idx] = total
+        total += _count_tokens(item["text"])
+
+    chapters: List[dict] = []
+    for entry in package["toc"]:
+        idx = entry["spine_index"]
+        if idx not in starts:
+            continue
+        chapters.append(
+            {
+                "title": entry["title"],
+                "start_index": starts[idx],
+                "level": entry.get("level", 0),
+            }
+        )
 
-        opf_dir = PurePosixPath(rootfile).parent
-        spine_items: List[dict] = []
-        for idref in spine_ids:
-            item = manifest.get(idref)
-            if not item:
-                continue
-            media_type = item.get("media_type", "")
-            if media_type and media_type not in allowed_types:
-                continue
-            href = item.get("href")
-            if not href:
-                continue
-            zip_path = str(opf_dir / PurePosixPath(href))
-            try:
-                html_bytes = zf.read(zip_path)
-            except KeyError:
-                continue
-            try:
-                html_source = html_bytes.decode("utf-8", errors="ignore")
-            except UnicodeDecodeError:
-                html_source = html_bytes.decode("latin-1", errors="ignore")
-            try:
-                text = _html_to_text(html_source)
-                title = _extract_title(html_source)
-            except Exception:
-                continue
-            spine_items.append(
-                {
-                    "href": href,
-                    "path": _normalize_posix(str(opf_dir / PurePosixPath(href))),
-                    "text": text,
-                    "title": title,
-                }
-            )
-
-        full_text = _normalize_text("\n\n".join(item["text"] for item in spine_items if item["text"]))
-        if not full_text:
-            raise ValueError("EPUB had no readable text")
-
-        counts = [_count_tokens(item["text"]) for item in spine_items]
-        starts: List[int] = []
-        total = 0
-        for count in counts:
-            starts.append(total)
-            total += count
+    if not chapters:
+        for idx, item in items.items():
+            title = item["title"] or f"Chapter {idx + 1}"
+            chapters.append({"title": title, "start_index": starts[idx], "level": 0})
 
-        spine_path_map = {item["path"]: idx for idx, item in enumerate(spine_items)}
+    return {"text": full_text, "chapters": chapters, "partial": partial}
 
-        toc_entries = _parse_nav_toc(zf, opf_dir, nav_href) or _parse_ncx_toc(zf, opf_dir, ncx_href)
 
-        chapters: List[dict] = []
-        if toc_entries:
-            for entry in toc_entries:
-                idx = spine_path_map.get(entry["path"])
-                if idx is None:
-                    continue
-                chapters.append(
-                    {
-                        "title": entry["title"],
-                        "start_index": starts[idx],
-                        "level": entry.get("level", 0),
-                    }
-                )
+def _extract_epub_data(
+    data: bytes,
+    chapters: str | None = None,
+    spine: str | None = None,
+) -> tuple[str, List[dict]]:
+    result = _run_epub_import(_start_epub_import(data, chapters, spine))
+    return result["text"], result["chapters"]
 
-        if not chapters:
-            for idx, item in enumerate(spine_items):
-                title = item["title"] or f"Chapter {idx + 1}"
-                chapters.append({"title": title, "start_index": starts[idx], "level": 0})
 
-        return full_text, chapters
+_import_states: OrderedDict[str, dict] = OrderedDict()
+_import_states_lock = threading.Lock()
 
 
-def _extract_pdf_data(data: bytes) -> tuple[str, int, List[dict]]:
+def _import_deadline() -> float:
+    budget = max(IMPORT_TIMEOUT_SECONDS - IMPORT_DEADLINE_MARGIN_SECONDS, IMPORT_TIMEOUT_SECONDS / 2)
+    return time.monotonic() + budget
+
+
+def _run_import(
+    state: dict,
+    deadline: float | None,
+    text_offset: int | None = None,
+    token_offset: int | None = None,
+) -> dict:
+    # A retry waits for a run that outlived its request (408 or lost response);
+    # if that run is still going at the deadline, the retry times out as well.
+    timeout = -1 if deadline is None else max(deadline - time.monotonic(), 0)
+    if not state["lock"].acquire(timeout=timeout):
+        raise TimeoutError("Import is already in progress")
+    try:
+        # Each response carries only the text after the offsets the client holds;
+        # the runners rebuild the same prefix, so the client appends without
+        # re-parsing, and replaying a continuation returns the same delta.
+        if text_offset is None:
+            text_offset = state["sent_chars"]
+            token_offset = state["marks"][text_offset]
+        elif state["marks"].get(text_offset) != token_offset:
+            raise ValueError("Continuation offsets do not match this import")
+        runner = _run_pdf_import if state["kind"] == "pdf" else _run_epub_import
+        result = runner(state, deadline)
+        full_text = result["text"]
+        result["text"] = full_text[text_offset:]
+        result["text_offset"] = text_offset
+        result["token_offset"] = token_offset
+        if state["responses"]:
+            tokens = parse_text(result["text"])
+            result["tokens"] = [token.model_dump() for token in tokens]
+            token_count = len(tokens)
+        else:
+            token_count = _count_tokens(result["text"])
+        result["text_end"] = len(full_text)
+        result["token_end"] = token_offset + token_count
+        state["marks"][result["text_end"]] = result["token_end"]
+        state["sent_chars"] = result["text_end"]
+        state["responses"] += 1
+    finally:
+        state["lock"].release()
+
+    selected = state["selected"]
+    partial = result["partial"]
+    # Index once, when complete: partial prefixes would churn the document LRU.
+    result["document_id"], result["search_index"] = (
+        _register_document(full_text) if full_text and not partial else (None, None)
+    )
+    result["selection"] = state["selection"]
+    result["progress"] = {
+        "unit": "page" if state["kind"] == "pdf" else "spine_item",
+        "done": state["next"],
+        "total": len(selected),
+        "resume_at": selected[state["next"]] + 1 if partial else None,
+    }
+    result["continuation"] = state["id"] if partial else None
+    # Continued imports stay cached after completion so a lost final response
+    # can be replayed; the LRU bounds them like partial ones.
+    if partial or state["responses"] > 1:
+        with _import_states_lock:
+            _import_states[state["id"]] = state
+            _import_states.move_to_end(state["id"])
+            while len(_import_states) > IMPORT_STATE_CACHE_SIZE:
+                _import_states.popitem(last=False)
+    return result
+
+
+def _begin_import(start, deadline: float | None, *args) -> dict:
+    state = start(*args)
+    state["id"] = uuid.uuid4().hex
+    state["lock"] = threading.Lock()
+    state["sent_chars"] = 0
+    state["marks"] = {0: 0}
+    state["responses"] = 0
+    return _run_import(state, deadline)
+
+
+def _continue_import(
+    continuation: str,
+    deadline: float | None,
+    text_offset: int | None = None,
+    token_offset: int | None = None,
+) -> dict:
+    with _import_states_lock:
+        state = _import_states.get(continuation)
+    if state is None:
+        raise KeyError(continuation)
+    return _run_import(state, deadline, text_offset, token_offset)
+
+
+def _plan_epub_parts(package: dict) -> tuple[List[List[int]], List[dict]]:
+    # Split the spine at every item a TOC entry starts in; front matter joins the first part.
+    total = len(package["spine"])
+    starts = sorted({entry["spine_index"] for entry in package["toc"]}) or list(range(total))
+    if not starts:
+        return [], []
+    starts[0] = 0
+    bounds = starts + [total]
+    parts = [list(range(first, last)) for first, last in zip(bounds, bounds[1:])]
+    if package["toc"]:
+        entries = [
+            {
+                "title": entry["title"],
+                "level": entry.get("level", 0),
+                "part": bisect_right(starts, entry["spine_index"]) - 1,
+                "spine_index": entry["spine_index"],
+            }
+            for entry in package["toc"]
+        ]
+    else:
+        entries = [
+            {"title": f"Chapter {idx + 1}", "level": 0, "part": idx, "spine_index": idx}
+            for idx in range(total)
+        ]
+    return parts, entries
+
+
+_lazy_books: OrderedDict[str, dict] = OrderedDict()
+_lazy_parts: OrderedDict[tuple[str, int], dict] = OrderedDict()
+_lazy_decoding: dict[tuple[str, int], threading.Event] = {}
+_lazy_lock = threading.Lock()
+
+
+def _open_lazy_epub(data: bytes) -> tuple[str, dict]:
+    archive_id = hashlib.sha256(data).hexdigest()[:32]
+    with _lazy_lock:
+        book = _lazy_books.get(archive_id)
+        if book is not None:
+            _lazy_books.move_to_end(archive_id)
+            return archive_id, book
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        package = _load_epub_package(zf)
+    parts, entries = _plan_epub_parts(package)
+    if not parts:
+        raise ValueError("EPUB had no readable text")
+    book = {"data": data, "spine": package["spine"], "parts": parts, "entries": entries}
+    with _lazy_lock:
+        _lazy_books[archive_id] = book
+        while len(_lazy_books) > LAZY_BOOK_CACHE_SIZE:
+            evicted, _ = _lazy_books.popitem(last=False)
+            for key in [key for key in _lazy_parts if key[0] == evicted]:
+                del _lazy_parts[key]
+    return archive_id, book
+
+
+def _lazy_epub_part(archive_id: str, part: int) -> dict:
+    key = (archive_id, part)
+    # Wait for a decode already in flight (read-ahead or another request)
+    # instead of decoding the same part twice; retry if that decode failed.
+    while True:
+        with _lazy_lock:
+            cached = _lazy_parts.get(key)
+            if cached is not None:
+                _lazy_parts.move_to_end(key)
+                return cached
+            book = _lazy_books.get(archive_id)
+            if book is None:
+                raise KeyError(archive_id)
+            if not 0 <= part < len(book["parts"]):
+                raise IndexError(part)
+            pending = _lazy_decoding.get(key)
+            if pending is None:
+                done = _lazy_decoding[key] = threading.Event()
+                break
+        pending.wait()
+    try:
+        return _decode_lazy_part(book, key)
+    finally:
+        with _lazy_lock:
+            del _lazy_decoding[key]
+        done.set()
+
+
+def _decode_lazy_part(book: dict, key: tuple[str, int]) -> dict:
+    part = key[1]
+    texts: List[str] = []
+    starts: dict[int, int] = {}
+    total = 0
+    with zipfile.ZipFile(io.BytesIO(book["data"])) as zf:
+        for idx in book["parts"][part]:
+            item = _read_spine_item(zf, book["spine"][idx])
+            if item is None:
+                continue
+            starts[idx] = total
+            total += _count_tokens(item["text"])
+            if item["text"]:
+                texts.append(item["text"])
+    text = _normalize_text("\n\n".join(texts))
+    chapters = [
+        {"chapter": number, "start_index": starts.get(entry["spine_index"], 0)}
+        for number, entry in enumerate(book["entries"])
+        if entry["part"] == part
+    ]
+    payload = {
+        "part": part,
+        "text": text,
+        "tokens": [token.model_dump() for token in parse_text(text)],
+        "chapters": chapters,
+    }
+    with _lazy_lock:
+        # Skip caching if the book was evicted mid-decode; the part would be orphaned.
+        if _lazy_books.get(key[0]) is book:
+            _lazy_parts[key] = payload
+            while len(_lazy_parts) > LAZY_PART_CACHE_SIZE:
+                _lazy_parts.popitem(last=False)
+    return payload
+
+
+def _open_lazy_epub_first_part(data: bytes) -> tuple[str, dict, dict]:
+    archive_id, book = _open_lazy_epub(data)
+    return archive_id, book, _lazy_epub_part(archive_id, 0)
+
+
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _finish_read_ahead(task: asyncio.Task) -> None:
+    # Read-ahead is best effort: an evicted book or a bad chapter surfaces when
+    # the part is actually requested, so retrieve and drop the exception here.
+    _background_tasks.discard(task)
+    if not task.cancelled():
+        task.exception()
+
+
+def _read_ahead(archive_id: str, part: int) -> None:
+    with _lazy_lock:
+        book = _lazy_books.get(archive_id)
+        key = (archive_id, part)
+        if book is None or part >= len(book["parts"]) or key in _lazy_parts or key in _lazy_decoding:
+            return
+    task = asyncio.create_task(asyncio.to_thread(_lazy_epub_part, archive_id, part))
+    _background_tasks.add(task)
+    task.add_done_callback(_finish_read_ahead)
+
+
+def _start_pdf_import(data: bytes, pages: str | None = None) -> dict:
     try:
         reader = PdfReader(io.BytesIO(data))
     except Exception as exc:
@@ -489,20 +877,45 @@ def _extract_pdf_data(data: bytes) -> tuple[str, int, List[dict]]:
     if not reader.pages:
         raise ValueError("PDF had no pages")
 
-    chunks: List[str] = []
-    for page in reader.pages:
+    page_count = len(reader.pages)
+    selected = _parse_range_spec(pages, page_count, "page")
+    return {
+        "kind": "pdf",
+        "reader": reader,
+        "page_count": page_count,
+        "selected": selected if selected is not None else list(range(page_count)),
+        "selection": {"pages": pages},
+        "next": 0,
+        "chunks": [],
+    }
+
+
+def _run_pdf_import(state: dict, deadline: float | None = None) -> dict:
+    reader = state["reader"]
+    selected = state["selected"]
+    first = state["next"]
+    while state["next"] < len(selected):
+        if deadline is not None and state["next"] > first and time.monotonic() >= deadline:
+            break
         try:
-            text = page.extract_text() or ""
+            text = reader.pages[selected[state["next"]]].extract_text() or ""
         except Exception:
-            continue
+            text = ""
         if text:
-            chunks.append(text)
+            state["chunks"].append(text)
+        state["next"] += 1
+    partial = state["next"] < len(selected)
 
-    full_text = _normalize_text("\n\n".join(chunks))
-    if not full_text:
+    full_text = _normalize_text("\n\n".join(state["chunks"]))
+    if not full_text and not partial:
         raise ValueError("PDF had no readable text")
     sections = _extract_pdf_sections(full_text)
-    return full_text, len(reader.pages), sections
+    return {"text": full_text, "pages": state["page_count"], "chapters": sections, "partial": partial}
+
+
+def _extract_pdf_data(data: bytes, pages: str | None = None) -> tuple[str, int, List[dict]]:
+    result = _run_pdf_import(_start_pdf_import(data, pages))
+    return result["text"], result["pages"], result["chapters"]
 
 
 def _extract_pdf_sections(text: str) -> List[dict]:
@@ -638,14 +1051,257 @@ def parse_text(text: str) -> List[Token]:
     return tokens
 
 
+def _build_search_index(text: str) -> dict:
+    # Map case-folded token cores to their token indices; indices line up with
+    # parse_text(text), so the client can jump straight to a match.
+    started = time.perf_counter()
+    postings: dict[str, array] = {}
+    offsets = array("I")
+    keys: dict[str, str | None] = {}
+    for match in WORD_PATTERN.finditer(text):
+        raw = match.group()
+        if raw in keys:
+            key = keys[raw]
+        else:
+            parts = _split_parts(raw)
+            key = keys[raw] = parts[1].casefold() if parts else None
+        if key is None:
+            continue
+        positions = postings.get(key)
+        if positions is None:
+            positions = postings[key] = array("I")
+        positions.append(len(offsets))
+        offsets.append(match.start())
+    # Resident size of the index structures, object headers included.
+    size = sys.getsizeof(postings) + sys.getsizeof(offsets)
+    for key, positions in postings.items():
+        size += sys.getsizeof(key) + sys.getsizeof(positions)
+    stats = {
+        "tokens": len(offsets),
+        "terms": len(postings),
+        "bytes": size,
+        "build_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+    return {"postings": postings, "offsets": offsets, "stats": stats}
+
+
+def _search_index(text: str, index: dict, query: str, limit: int) -> tuple[int, List[dict]]:
+    terms = [token.core.casefold() for token in parse_text(query)]
+    if not terms:
+        raise ValueError("Query has no searchable words")
+    postings = index["postings"]
+    offsets = index["offsets"]
+    lists = [postings.get(term) for term in terms]
+    if any(positions is None for positions in lists):
+        return 0, []
+
+    def follows(positions: array, target: int) -> bool:
+        pos = bisect_left(positions, target)
+        return pos < len(positions) and positions[pos] == target
+
+    hits = [
+        start
+        for start in lists[0]
+        if all(follows(positions, start + k) for k, positions in enumerate(lists[1:], 1))
+    ]
+    matches: List[dict] = []
+    for start in hits[:limit]:
+        first = max(0, start - SEARCH_CONTEXT_WORDS)
+        last = min(len(offsets) - 1, start + len(terms) - 1 + SEARCH_CONTEXT_WORDS)
+        end = WORD_PATTERN.match(text, offsets[last]).end()
+        snippet = _normalize_space(text[offsets[first] : end])
+        matches.append({"index": start, "snippet": snippet})
+    return len(hits), matches
+
+
+_documents: OrderedDict[str, dict] = OrderedDict()
+_documents_lock = threading.Lock()
+
+
+def _register_document(text: str) -> tuple[str, dict]:
+    document_id = hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+    with _documents_lock:
+        document = _documents.get(document_id)
+        if document is not None:
+            _documents.move_to_end(document_id)
+            return document_id, document["index"]["stats"]
+    index = _build_search_index(text)
+    with _documents_lock:
+        _documents[document_id] = {"text": text, "index": index}
+        _documents.move_to_end(document_id)
+        while len(_documents) > DOCUMENT_CACHE_SIZE:
+            _documents.popitem(last=False)
+    return document_id, index["stats"]
+
+
+def _get_document(document_id: str) -> dict | None:
+    with _documents_lock:
+        document = _documents.get(document_id)
+        if document is not None:
+            _documents.move_to_end(document_id)
+        return document
+
+
+_profiles: OrderedDict[str, dict] = OrderedDict()
+_profiles_lock = threading.Lock()
+# From Python 3.12 cProfile is process-wide: only one profiler may be active.
+_profiler_lock = threading.Lock()
+
+
+def _has_profile_token(request: Request) -> bool:
+    if not PROFILE_TOKEN:
+        return False
+    # Header only: a query parameter would leak the secret into access logs and history.
+    supplied = request.headers.get("x-profile-token")
+    return bool(supplied) and hmac.compare_digest(supplied.encode(), PROFILE_TOKEN.encode())
+
+
+def _collapse_stats(stats: dict) -> str:
+    # Fold the cProfile call graph into "caller;callee microseconds" lines for
+    # flamegraph.pl / speedscope. Shared callees are split by each caller's share;
+    # subtrees below PROFILE_MIN_SHARE of the total are dropped, which keeps the
+    # path enumeration bounded on large call graphs.
+    def label(func: tuple) -> str:
+        filename, line, name = func
+        if filename == "~":
+            return name
+        return f"{name} ({PurePosixPath(filename).name}:{line})"
+
+    callees: dict[tuple, List[tuple]] = {}
+    roots: List[tuple] = []
+    for func, (_, _, _, _, callers) in stats.items():
+        if not callers:
+            roots.append(func)
+        for caller, edge in callers.items():
+            callees.setdefault(caller, []).append((func, edge[3]))
+
+    lines: dict[str, float] = {}
+    floor = sum(stats[root][3] for root in roots) * PROFILE_MIN_SHARE
+
+    def walk(func: tuple, path: List[str], seen: set, share: float, depth: int) -> None:
+        _, _, self_time, cumulative, _ = stats[func]
+        if cumulative <= 0 or share < floor or depth > PROFILE_MAX_DEPTH:
+            return
+        scale = share / cumulative
+        stack = path + [label(func)]
+        key = ";".join(stack)
+        lines[key] = lines.get(key, 0.0) + self_time * scale
+        for callee, edge_time in callees.get(func, []):
+            if callee in seen:
+                continue
+            walk(callee, stack, seen | {callee}, edge_time * scale, depth + 1)
+
+    for root in roots:
+        walk(root, [], {root}, stats[root][3], 0)
+    return "\n".join(
+        f"{stack} {round(seconds * 1_000_000)}"
+        for stack, seconds in sorted(lines.items())
+        if round(seconds * 1_000_000) > 0
+    )
+
+
+def _store_profile(profile_id: str, entry: dict) -> None:
+    with _profiles_lock:
+        _profiles[profile_id] = entry
+        while len(_profiles) > PROFILE_CACHE_SIZE:
+            _profiles.popitem(last=False)
+
+
+def _profiled_call(profile_id: str, label: str, fn, *args):
+    # A busy or unavailable profiler never fails the request: it runs unprofiled
+    # and the entry records why.
+    if not _profiler_lock.acquire(blocking=False):
+        _store_profile(profile_id, {"label": label, "status": "busy", "created": time.time()})
+        return fn(*args)
+    try:
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            _store_profile(profile_id, {"label": label, "status": "unavailable", "created": time.time()})
+            return fn(*args)
+        _store_profile(profile_id, {"label": label, "status": "running", "created": time.time()})
+        started = time.perf_counter()
+        status = "ok"
+        result = None
+        try:
+            result = fn(*args)
+            return result
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            profiler.disable()
+            elapsed = time.perf_counter() - started
+            profiler.create_stats()
+            entry = {
+                "label": label,
+                "status": status,
+                "created": time.time(),
+                "elapsed_ms": round(elapsed * 1000, 2),
+                # Folded stacks are built on first download, off the request path.
+                "pstats": marshal.dumps(profiler.stats),
+            }
+            # Profiling slows imports enough to hit the deadline; say where it cut off.
+            if isinstance(result, dict) and result.get("partial"):
+                entry["cutoff"] = result["progress"]
+            _store_profile(profile_id, entry)
+    finally:
+        _profiler_lock.release()
+
+
+def _offload(request: Request, response: Response, label: str, fn, *args):
+    # Runs fn in a worker thread; with a valid profile token the thread is profiled
+    # and the profile id is returned in X-Profile-Id (also listed at /api/profiles).
+    if not _has_profile_token(request):
+        return asyncio.to_thread(fn, *args)
+    profile_id = uuid.uuid4().hex[:16]
+    response.headers["X-Profile-Id"] = profile_id
+    return asyncio.to_thread(_profiled_call, profile_id, label, fn, *args)
+
+
 @app.post("/api/parse")
-def parse_endpoint(payload: ParseRequest):
-    tokens = parse_text(payload.text)
-    return {"tokens": [token.model_dump() for token in tokens]}
+def parse_endpoint(payload: ParseRequest, request: Request, response: Response):
+    if _has_profile_token(request):
+        profile_id = uuid.uuid4().hex[:16]
+        response.headers["X-Profile-Id"] = profile_id
+        tokens = _profiled_call(profile_id, "parse", parse_text, payload.text)
+    else:
+        tokens = parse_text(payload.text)
+    return {"tokens": [token.model_dump() for token in tokens], "parser_version": PARSER_VERSION}
+
+
+@app.post("/api/documents")
+async def register_document_endpoint(payload: ParseRequest):
+    if not payload.text.strip():
+        raise HTTPException(status_code=400, detail="Text is empty")
+    document_id, index_stats = await asyncio.to_thread(_register_document, payload.text)
+    return {
+        "document_id": document_id,
+        "search_index": index_stats,
+        "parser_version": PARSER_VERSION,
+    }
+
+
+@app.get("/api/documents/{document_id}")
+def document_lookup_endpoint(document_id: str):
+    # Cheap revalidation for client caches: no upload, no extraction.
+    return {
+        "document_id": document_id,
+        "indexed": _get_document(document_id) is not None,
+        "parser_version": PARSER_VERSION,
+    }
 
 
 @app.post("/api/epub")
-async def epub_endpoint(file: UploadFile = File(...)):
+async def epub_endpoint(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    chapters: str | None = Form(None),
+    spine: str | None = Form(None),
+    lazy: bool = Form(False),
+):
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file uploaded")
     if not file.filename.lower().endswith(".epub"):
@@ -655,9 +1311,82 @@ async def epub_endpoint(file: UploadFile = File(...)):
     if not data:
         raise HTTPException(status_code=400, detail="File is empty")
 
+    if lazy:
+        if chapters or spine:
+            raise HTTPException(status_code=400, detail="Lazy imports load every chapter on demand")
+        return await _lazy_epub_response(request, response, file.filename, data)
+
+    deadline = _import_deadline()
+    try:
+        result = await asyncio.wait_for(
+            _offload(
+                request,
+                response,
+                f"epub {file.filename}",
+                _begin_import,
+                _start_epub_import,
+                deadline,
+                data,
+                chapters,
+                spine,
+            ),
+            timeout=IMPORT_TIMEOUT_SECONDS,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except asyncio.TimeoutError as exc:
+        raise HTTPException(status_code=408, detail="EPUB import timed out") from exc
+    except zipfile.BadZipFile as exc:
+        raise HTTPException(status_code=400, detail="Invalid EPUB archive") from exc
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail="EPUB import failed") from exc
+
+    return _import_response(result)
+
+
+def _import_response(result: dict) -> dict:
+    return {**result, "parser_version": PARSER_VERSION}
+
+
+@app.post("/api/imports/{continuation}")
+async def import_continue_endpoint(
+    continuation: str,
+    request: Request,
+    response: Response,
+    payload: ContinueImportRequest | None = None,
+):
+    payload = payload or ContinueImportRequest()
+    deadline = _import_deadline()
     try:
-        text, chapters = await asyncio.wait_for(
-            asyncio.to_thread(_extract_epub_data, data),
+        result = await asyncio.wait_for(
+            _offload(
+                request,
+                response,
+                "import continuation",
+                _continue_import,
+                continuation,
+                deadline,
+                payload.text_offset,
+                payload.token_offset,
+            ),
+            timeout=IMPORT_TIMEOUT_SECONDS,
+        )
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="Import state expired; upload the file again") from exc
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    except asyncio.TimeoutError as exc:
+        raise HTTPException(status_code=408, detail="Import timed out") from exc
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail="Import failed") from exc
+
+    return _import_response(result)
+
+
+async def _lazy_epub_response(request: Request, response: Response, filename: str, data: bytes) -> dict:
+    try:
+        archive_id, book, first_part = await asyncio.wait_for(
+            _offload(request, response, f"epub lazy {filename}", _open_lazy_epub_first_part, data),
             timeout=IMPORT_TIMEOUT_SECONDS,
         )
     except ValueError as exc:
@@ -669,11 +1398,47 @@ async def epub_endpoint(file: UploadFile = File(...)):
     except Exception as exc:
         raise HTTPException(status_code=500, detail="EPUB import failed") from exc
 
-    return {"text": text, "chapters": chapters}
+    _read_ahead(archive_id, 1)
+    return {
+        "lazy": True,
+        "archive_id": archive_id,
+        "parts": len(book["parts"]),
+        "chapters": [
+            {"title": entry["title"], "level": entry["level"], "part": entry["part"]}
+            for entry in book["entries"]
+        ],
+        "part": first_part,
+        "parser_version": PARSER_VERSION,
+    }
+
+
+@app.get("/api/epub/{archive_id}/parts/{part}")
+async def epub_part_endpoint(archive_id: str, part: int, request: Request, response: Response):
+    try:
+        payload = await asyncio.wait_for(
+            _offload(request, response, f"epub part {part}", _lazy_epub_part, archive_id, part),
+            timeout=IMPORT_TIMEOUT_SECONDS,
+        )
+    except KeyError as exc:
+        raise HTTPException(status_code=404, detail="EPUB is no longer loaded; import it again") from exc
+    except IndexError as exc:
+        raise HTTPException(status_code=404, detail="Chapter not found") from exc
+    except asyncio.TimeoutError as exc:
+        raise HTTPException(status_code=408, detail="Chapter extraction timed out") from exc
+    except Exception as exc:
+        raise HTTPException(status_code=500, detail="Chapter extraction failed") from exc
+
+    _read_ahead(archive_id, part + 1)
+    return {**payload, "parser_version": PARSER_VERSION}
 
 
 @app.post("/api/pdf")
-async def pdf_endpoint(file: UploadFile = File(...)):
+async def pdf_endpoint(
+    request: Request,
+    response: Response,
+    file: UploadFile = File(...),
+    pages: str | None = Form(None),
+):
     if not file.filename:
         raise HTTPException(status_code=400, detail="No file uploaded")
     if not file.filename.lower().endswith(".pdf"):
@@ -683,9 +1448,19 @@ async def pdf_endpoint(file: UploadFile = File(...)):
     if not data:
         raise HTTPException(status_code=400, detail="File is empty")
 
+    deadline = _import_deadline()
     try:
-        text, pages, sections = await asyncio.wait_for(
-            asyncio.to_thread(_extract_pdf_data, data),
+        result = await asyncio.wait_for(
+            _offload(
+                request,
+                response,
+                f"pdf {file.filename}",
+                _begin_import,
+                _start_pdf_import,
+                deadline,
+                data,
+                pages,
+            ),
             timeout=IMPORT_TIMEOUT_SECONDS,
         )
     except ValueError as exc:
@@ -695,7 +1470,135 @@ async def pdf_endpoint(file: UploadFile = File(...)):
     except Exception as exc:
         raise HTTPException(status_code=500, detail="PDF import failed") from exc
 
-    return {"text": text, "pages": pages, "chapters": sections}
+    return _import_response(result)
+
+
+@app.get("/api/search")
+def search_endpoint(document_id: str, q: str, limit: int = SEARCH_RESULT_LIMIT):
+    document = _get_document(document_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail="Document not found")
+    started = time.perf_counter()
+    try:
+        total, matches = _search_index(
+            document["text"], document["index"], q, max(1, min(limit, SEARCH_RESULT_LIMIT))
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {
+        "query": q,
+        "total": total,
+        "matches": matches,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
+
+class PrecompressedStaticFiles(StaticFiles):
+    # Serves foo.js.br / foo.js.gz siblings when the client accepts them, and marks
+    # fingerprinted names immutable while everything else (index.html) revalidates.
+    def _compressed_variants(self, full_path: str) -> List[tuple[str, str, os.stat_result]]:
+        # Stat on every request: build_static.py rewrites variants in place, and a
+        # cached stat would send a stale Content-Length/ETag for the new file.
+        variants = []
+        for encoding, suffix in PRECOMPRESSED_ENCODINGS:
+            candidate = full_path + suffix
+            try:
+                variants.append((encoding, candidate, os.stat(candidate)))
+            except OSError:
+                continue
+        return variants
+
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        accepted = {
+            value.split(";")[0].strip().lower()
+            for value in request_headers.get("accept-encoding", "").split(",")
+        }
+        variants = self._compressed_variants(full_path)
+        headers = {
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL
+            if FINGERPRINT_PATTERN.search(os.path.basename(full_path))
+            else REVALIDATE_CACHE_CONTROL
+        }
+        if variants:
+            headers["Vary"] = "Accept-Encoding"
+        serve_path = full_path
+        for encoding, candidate, candidate_stat in variants:
+            if encoding in accepted:
+                headers["Content-Encoding"] = encoding
+                serve_path, stat_result = candidate, candidate_stat
+                break
+        media_type = mimetypes.guess_type(full_path)[0] or "text/plain"
+        response = FileResponse(
+            serve_path,
+            status_code=status_code,
+            stat_result=stat_result,
+            media_type=media_type,
+            headers=headers,
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+
+def _require_profile_token(request: Request) -> None:
+    if not PROFILE_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not _has_profile_token(request):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+
+@app.get("/api/profiles")
+def profiles_endpoint(request: Request):
+    _require_profile_token(request)
+    with _profiles_lock:
+        items = list(_profiles.items())
+    return {
+        "profiles": [
+            {
+                "id": profile_id,
+                "label": entry["label"],
+                "status": entry["status"],
+                "created": entry["created"],
+                "elapsed_ms": entry.get("elapsed_ms"),
+                "cutoff": entry.get("cutoff"),
+            }
+            for profile_id, entry in reversed(items)
+        ]
+    }
+
+
+@app.get("/api/profiles/{profile_id}")
+def profile_download_endpoint(profile_id: str, request: Request, format: str = "pstats"):
+    _require_profile_token(request)
+    with _profiles_lock:
+        entry = _profiles.get(profile_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if entry["status"] == "running":
+        raise HTTPException(status_code=409, detail="Profile is still running")
+    if "pstats" not in entry:
+        raise HTTPException(status_code=409, detail=f"Request ran unprofiled: profiler was {entry['status']}")
+    if format == "pstats":
+        content, media_type, suffix = entry["pstats"], "application/octet-stream", "pstats"
+    elif format == "collapsed":
+        if "collapsed" not in entry:
+            entry["collapsed"] = _collapse_stats(marshal.loads(entry["pstats"]))
+        content, media_type, suffix = entry["collapsed"], "text/plain", "collapsed.txt"
+    else:
+        raise HTTPException(status_code=400, detail="Format must be pstats or collapsed")
+    return Response(
+        content=content,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.{suffix}"'},
+    )
 
 
-app.mount("/", StaticFiles(directory="static", html=True), name="static")
+app.mount("/", PrecompressedStaticFiles(directory=STATIC_DIR, html=True), name="static")
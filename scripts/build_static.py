@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""Build fingerprinted, precompressed static assets for production serving.
+
+Copies ``static/`` to ``build/static/``, renames every non-HTML asset to
+``name.<hash>.ext``, rewrites the references in the HTML files and writes
+``.gz`` (and ``.br`` when the optional ``brotli`` package is installed)
+siblings next to each compressible file. Point ``main.py`` at the output
+with ``PIVOTSTREAM_STATIC_DIR=build/static``.
+
+Example:
+    python scripts/build_static.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import re
+import shutil
+import sys
+from pathlib import Path
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+ROOT = Path(__file__).resolve().parents[1]
+SOURCE_DIR = ROOT / "static"
+BUILD_DIR = ROOT / "build" / "static"
+HASH_LENGTH = 10
+COMPRESSIBLE_SUFFIXES = {".html", ".js", ".css", ".svg", ".json", ".txt"}
+MIN_COMPRESS_BYTES = 256
+
+
+def fingerprint(path: Path) -> str:
+    digest = hashlib.sha256(path.read_bytes()).hexdigest()[:HASH_LENGTH]
+    return f"{path.stem}.{digest}{path.suffix}"
+
+
+def rewrite_references(html: str, renames: dict[str, str]) -> str:
+    # Matches src/href values pointing at a renamed asset, dropping any ?v= cache buster.
+    def replace(match: re.Match) -> str:
+        target = match.group("path")
+        renamed = renames.get(target.lstrip("./"))
+        if renamed is None:
+            return match.group(0)
+        prefix = target[: len(target) - len(target.lstrip("./"))]
+        return f'{match.group("attr")}="{prefix}{renamed}"'
+
+    pattern = re.compile(r'(?P<attr>src|href)="(?P<path>[^"?#]+)(?:\?[^"#]*)?"')
+    return pattern.sub(replace, html)
+
+
+def compress(path: Path) -> dict[str, int]:
+    data = path.read_bytes()
+    sizes = {"raw": len(data)}
+    if path.suffix not in COMPRESSIBLE_SUFFIXES or len(data) < MIN_COMPRESS_BYTES:
+        return sizes
+    gz_path = path.with_name(path.name + ".gz")
+    gz_path.write_bytes(gzip.compress(data, compresslevel=9, mtime=0))
+    sizes["gzip"] = gz_path.stat().st_size
+    if brotli is not None:
+        br_path = path.with_name(path.name + ".br")
+        br_path.write_bytes(brotli.compress(data, quality=11))
+        sizes["br"] = br_path.stat().st_size
+    return sizes
+
+
+def build(source: Path, output: Path) -> dict:
+    if output.exists():
+        shutil.rmtree(output)
+    output.mkdir(parents=True)
+
+    renames: dict[str, str] = {}
+    html_files: list[Path] = []
+    for path in sorted(source.rglob("*")):
+        if not path.is_file():
+            continue
+        relative = path.relative_to(source)
+        if path.suffix == ".html":
+            html_files.append(relative)
+            continue
+        target = relative.with_name(fingerprint(path))
+        (output / target).parent.mkdir(parents=True, exist_ok=True)
+        shutil.copy2(path, output / target)
+        renames[relative.as_posix()] = target.as_posix()
+
+    for relative in html_files:
+        html = (source / relative).read_text(encoding="utf-8")
+        target = output / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_text(rewrite_references(html, renames), encoding="utf-8")
+
+    files = {}
+    for path in sorted(output.rglob("*")):
+        if path.is_file() and path.suffix not in {".gz", ".br"}:
+            files[path.relative_to(output).as_posix()] = compress(path)
+
+    manifest = {"assets": renames, "sizes": files, "brotli": brotli is not None}
+    (output / "asset-manifest.json").write_text(json.dumps(manifest, indent=2) + "\n", encoding="utf-8")
+    return manifest
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Fingerprint and precompress static assets.")
+    parser.add_argument("--source", type=Path, default=SOURCE_DIR)
+    parser.add_argument("--output", type=Path, default=BUILD_DIR)
+    args = parser.parse_args()
+
+    manifest = build(args.source, args.output)
+    if not manifest["brotli"]:
+        print("brotli is not installed; writing gzip variants only", file=sys.stderr)
+    for name, sizes in manifest["sizes"].items():
+        variants = ", ".join(f"{encoding} {size}" for encoding, size in sizes.items())
+        print(f"{name}: {variants} bytes")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
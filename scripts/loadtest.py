@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+"""Local load-testing harness for the PivotStream FastAPI service.
+
+Launches ``uvicorn main:app`` on a free local port (or targets ``--url``),
+drives it with a weighted mix of scenarios from concurrent asyncio workers
+and writes a JSON report with throughput, latency percentiles, error and
+timeout rates and server RSS samples.
+
+Example:
+    python scripts/loadtest.py --concurrency 16 --duration 30 \\
+        --mix parse=5,static=3,epub=1,pdf=1 --output loadtest-report.json
+
+Only the standard library is used so the harness runs from a plain
+``requirements.txt`` install.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+import uuid
+import zipfile
+from pathlib import Path
+from urllib.parse import urlsplit
+
+ROOT = Path(__file__).resolve().parents[1]
+BOOKS_DIR = ROOT / "books"
+STATIC_DIR = os.environ.get("PIVOTSTREAM_STATIC_DIR", "static")
+ASSET_PATTERN = re.compile(r'(?:src|href)="(?P<path>[^"#:]+)"')
+DEFAULT_MIX = "parse=5,static=3,epub=1,pdf=1"
+RSS_SAMPLE_SECONDS = 0.5
+
+WORDS = (
+    "focus reading window anchored pivot letter sentence chapter quiet river "
+    "mountain signal pattern rhythm careful notice measure between through "
+    "however, therefore; although: because. wonderful extraordinary! question? "
+    "it's well-known \"quoted\" (aside) numbers 1984 3.14 rapid serial visual"
+).split()
+
+CONTAINER_XML = """<?xml version="1.0"?>
+<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">
+  <rootfiles>
+    <rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml" />
+  </rootfiles>
+</container>
+"""
+
+
+def generate_text(rng: random.Random, words: int) -> str:
+    lines = []
+    for start in range(0, words, 12):
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(min(12, words - start))))
+    return "\n".join(lines)
+
+
+def generate_epub(rng: random.Random, chapters: int, words_per_chapter: int) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("META-INF/container.xml", CONTAINER_XML)
+        items = ['<item id="nav" href="toc.xhtml" media-type="application/xhtml+xml" properties="nav" />']
+        refs = []
+        links = []
+        for idx in range(1, chapters + 1):
+            items.append(
+                f'<item id="c{idx}" href="c{idx}.xhtml" media-type="application/xhtml+xml" />'
+            )
+            refs.append(f'<itemref idref="c{idx}" />')
+            links.append(f'<li><a href="c{idx}.xhtml">Chapter {idx}</a></li>')
+            body = "".join(
+                f"<p>{generate_text(rng, 60)}</p>" for _ in range(max(1, words_per_chapter // 60))
+            )
+            zf.writestr(
+                f"OEBPS/c{idx}.xhtml",
+                f'<html xmlns="http://www.w3.org/1999/xhtml"><head><title>Chapter {idx}</title></head>'
+                f"<body><h1>Chapter {idx}</h1>{body}</body></html>",
+            )
+        zf.writestr(
+            "OEBPS/content.opf",
+            '<?xml version="1.0" encoding="utf-8"?>'
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0">'
+            f"<manifest>{''.join(items)}</manifest><spine>{''.join(refs)}</spine></package>",
+        )
+        zf.writestr(
+            "OEBPS/toc.xhtml",
+            '<html xmlns="http://www.w3.org/1999/xhtml"><body>'
+            f'<nav epub:type="toc"><ol>{"".join(links)}</ol></nav></body></html>',
+        )
+    return buf.getvalue()
+
+
+def load_pdfs() -> list[tuple[str, bytes]]:
+    pdfs = []
+    for path in sorted(BOOKS_DIR.glob("*.pdf")):
+        data = path.read_bytes()
+        # Skip Git LFS pointers left behind by a checkout without LFS.
+        if data.startswith(b"%PDF"):
+            pdfs.append((path.name, data))
+    return pdfs
+
+
+def multipart_body(field: str, filename: str, data: bytes, content_type: str) -> tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode()
+    tail = f"\r\n--{boundary}--\r\n".encode()
+    return head + data + tail, f"multipart/form-data; boundary={boundary}"
+
+
+def build_scenarios(args: argparse.Namespace) -> dict[str, list[tuple[str, str, bytes, dict]]]:
+    """Return pre-built (method, path, body, headers) requests per scenario."""
+    rng = random.Random(args.seed)
+    scenarios: dict[str, list[tuple[str, str, bytes, dict]]] = {}
+
+    parse_requests = []
+    for words in (50, 500, args.parse_words):
+        body = json.dumps({"text": generate_text(rng, words)}).encode()
+        parse_requests.append(("POST", "/api/parse", body, {"Content-Type": "application/json"}))
+    scenarios["parse"] = parse_requests
+
+    epub_requests = []
+    for chapters in (3, args.epub_chapters):
+        epub = generate_epub(rng, chapters, args.epub_chapter_words)
+        body, content_type = multipart_body("file", f"generated-{chapters}.epub", epub, "application/epub+zip")
+        epub_requests.append(("POST", "/api/epub", body, {"Content-Type": content_type}))
+    scenarios["epub"] = epub_requests
+
+    pdf_requests = []
+    for name, data in load_pdfs():
+        body, content_type = multipart_body("file", name, data, "application/pdf")
+        pdf_requests.append(("POST", "/api/pdf", body, {"Content-Type": content_type}))
+    if pdf_requests:
+        scenarios["pdf"] = pdf_requests
+
+    # Ask for compressed bodies like a browser, so precompressed variants are exercised.
+    scenarios["static"] = [
+        ("GET", path, b"", {"Accept-Encoding": "br, gzip"}) for path in static_paths(args.static_dir)
+    ]
+    return scenarios
+
+
+def static_paths(static_dir: str) -> list[str]:
+    # Read asset names from the served index.html so fingerprinted builds are hit too.
+    index = ROOT / static_dir / "index.html"
+    assets = ASSET_PATTERN.findall(index.read_text(encoding="utf-8"))
+    return ["/"] + ["/" + path.lstrip("./") for path in dict.fromkeys(assets)]
+
+
+def parse_mix(spec: str) -> dict[str, int]:
+    mix: dict[str, int] = {}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        mix[name.strip()] = int(weight or 1)
+    return mix
+
+
+class HttpConnection:
+    """Minimal keep-alive HTTP/1.1 client on top of asyncio streams."""
+
+    def __init__(self, host: str, port: int) -> None:
+        self.host = host
+        self.port = port
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            try:
+                await self.writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method: str, path: str, body: bytes, headers: dict) -> tuple[int, bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}:{self.port}"]
+        lines += [f"{name}: {value}" for name, value in headers.items()]
+        lines.append(f"Content-Length: {len(body)}")
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode() + body)
+        await self.writer.drain()
+
+        status_line = await self.reader.readline()
+        if not status_line:
+            raise ConnectionError("Server closed connection")
+        status = int(status_line.split()[1])
+        length = None
+        keep_alive = True
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            name = name.strip().lower()
+            if name == "content-length":
+                length = int(value.strip())
+            elif name == "connection" and value.strip().lower() == "close":
+                keep_alive = False
+        if length is None:
+            payload = await self.reader.read()
+            keep_alive = False
+        else:
+            payload = await self.reader.readexactly(length)
+        if not keep_alive:
+            await self.close()
+        return status, payload
+
+
+def percentile(values: list[float], pct: float) -> float | None:
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return round(ordered[rank], 2)
+
+
+def summarize(samples: list[dict], elapsed: float) -> dict:
+    latencies = [sample["latency_ms"] for sample in samples if sample["status"] is not None]
+    statuses: dict[str, int] = {}
+    errors = 0
+    timeouts = 0
+    partials = 0
+    for sample in samples:
+        if sample["partial"]:
+            partials += 1
+        key = str(sample["status"]) if sample["status"] is not None else sample["error"]
+        statuses[key] = statuses.get(key, 0) + 1
+        if sample["error"] == "timeout" or sample["status"] == 408:
+            timeouts += 1
+        if sample["status"] is None or sample["status"] >= 400:
+            errors += 1
+    total = len(samples)
+    return {
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "max": round(max(latencies), 2) if latencies else None,
+            "mean": round(sum(latencies) / len(latencies), 2) if latencies else None,
+        },
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "timeout_rate": round(timeouts / total, 4) if total else 0.0,
+        "partial_rate": round(partials / total, 4) if total else 0.0,
+        "status_counts": statuses,
+        "bytes_received": sum(sample["bytes"] for sample in samples),
+    }
+
+
+def read_rss_kb(pid: int) -> int | None:
+    try:
+        with open(f"/proc/{pid}/status", encoding="ascii") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    try:
+        output = subprocess.run(
+            ["ps", "-o", "rss=", "-p", str(pid)], capture_output=True, text=True, check=True
+        ).stdout
+        return int(output.strip())
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return None
+
+
+async def sample_rss(pid: int, started: float, stop: asyncio.Event, out: list[dict]) -> None:
+    while not stop.is_set():
+        rss = read_rss_kb(pid)
+        if rss is not None:
+            out.append({"t": round(time.perf_counter() - started, 2), "rss_kb": rss})
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=RSS_SAMPLE_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def worker(
+    host: str,
+    port: int,
+    scenarios: dict,
+    names: list[str],
+    weights: list[int],
+    deadline: float,
+    budget: list[int],
+    rng: random.Random,
+    timeout: float,
+    samples: list[dict],
+) -> None:
+    conn = HttpConnection(host, port)
+    try:
+        while time.perf_counter() < deadline:
+            if budget[0] <= 0:
+                break
+            budget[0] -= 1
+            scenario = rng.choices(names, weights)[0]
+            method, path, body, headers = rng.choice(scenarios[scenario])
+            started = time.perf_counter()
+            sample = {"scenario": scenario, "status": None, "error": None, "bytes": 0, "partial": False}
+            try:
+                status, payload = await asyncio.wait_for(conn.request(method, path, body, headers), timeout)
+                sample["status"] = status
+                sample["bytes"] = len(payload)
+                # Imports that hit the server deadline return 200 with partial: true.
+                sample["partial"] = b'"partial":true' in payload
+            except asyncio.TimeoutError:
+                sample["error"] = "timeout"
+                await conn.close()
+            except (ConnectionError, OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                sample["error"] = "connection"
+                await conn.close()
+            sample["latency_ms"] = (time.perf_counter() - started) * 1000
+            samples.append(sample)
+    finally:
+        await conn.close()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def launch_server(port: int, args: argparse.Namespace) -> subprocess.Popen:
+    env = dict(os.environ)
+    if args.import_timeout is not None:
+        env["PIVOTSTREAM_IMPORT_TIMEOUT"] = str(args.import_timeout)
+    env["PIVOTSTREAM_STATIC_DIR"] = args.static_dir
+    command = [
+        sys.executable,
+        "-m",
+        "uvicorn",
+        "main:app",
+        "--host",
+        "127.0.0.1",
+        "--port",
+        str(port),
+        "--log-level",
+        "warning",
+        "--no-access-log",
+    ]
+    return subprocess.Popen(command, cwd=ROOT, env=env)
+
+
+async def wait_until_ready(host: str, port: int, proc: subprocess.Popen | None, limit: float = 20.0) -> None:
+    deadline = time.perf_counter() + limit
+    while time.perf_counter() < deadline:
+        if proc is not None and proc.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup")
+        conn = HttpConnection(host, port)
+        try:
+            status, _ = await asyncio.wait_for(conn.request("GET", "/", b"", {}), 2.0)
+            if status < 500:
+                return
+        except (OSError, ConnectionError, asyncio.TimeoutError):
+            await asyncio.sleep(0.2)
+        finally:
+            await conn.close()
+    raise RuntimeError("Server did not become ready")
+
+
+async def run(args: argparse.Namespace) -> dict:
+    mix = parse_mix(args.mix)
+    scenarios = build_scenarios(args)
+    unknown = sorted(set(mix) - set(scenarios))
+    if unknown:
+        raise SystemExit(f"Unknown or unavailable scenarios: {', '.join(unknown)}")
+    names = [name for name in mix if mix[name] > 0]
+    weights = [mix[name] for name in names]
+
+    proc = None
+    if args.url:
+        target = urlsplit(args.url)
+        host, port = target.hostname or "127.0.0.1", target.port or 80
+    else:
+        host, port = "127.0.0.1", free_port()
+        proc = launch_server(port, args)
+    try:
+        await wait_until_ready(host, port, proc)
+        rss_samples: list[dict] = []
+        stop = asyncio.Event()
+        started = time.perf_counter()
+        sampler = None
+        if proc is not None:
+            sampler = asyncio.create_task(sample_rss(proc.pid, started, stop, rss_samples))
+        samples: list[dict] = []
+        budget = [args.requests if args.requests else sys.maxsize]
+        rng = random.Random(args.seed)
+        await asyncio.gather(
+            *(
+                worker(
+                    host,
+                    port,
+                    scenarios,
+                    names,
+                    weights,
+                    started + args.duration,
+                    budget,
+                    random.Random(rng.random()),
+                    args.request_timeout,
+                    samples,
+                )
+                for _ in range(args.concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - started
+        stop.set()
+        if sampler is not None:
+            await sampler
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+    rss_values = [sample["rss_kb"] for sample in rss_samples]
+    return {
+        "config": {
+            "target": args.url or f"http://{host}:{port} (local uvicorn)",
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "request_limit": args.requests,
+            "request_timeout_s": args.request_timeout,
+            "import_timeout_s": args.import_timeout,
+            "mix": mix,
+            "seed": args.seed,
+        },
+        "elapsed_s": round(elapsed, 3),
+        "overall": summarize(samples, elapsed),
+        "scenarios": {
+            name: summarize([s for s in samples if s["scenario"] == name], elapsed) for name in names
+        },
+        "server_rss": {
+            "peak_kb": max(rss_values) if rss_values else None,
+            "start_kb": rss_values[0] if rss_values else None,
+            "end_kb": rss_values[-1] if rss_values else None,
+            "samples": rss_samples,
+        },
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Load-test the PivotStream API locally.")
+    parser.add_argument("--url", help="Target an already running server instead of launching uvicorn")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="Stop after this many requests (0 = no limit)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Weighted scenarios: parse, static, epub, pdf")
+    parser.add_argument("--request-timeout", type=float, default=30.0, help="Client-side timeout per request")
+    parser.add_argument(
+        "--import-timeout",
+        type=float,
+        help="Override the server import timeout to exercise partial imports and 408s (local server only)",
+    )
+    parser.add_argument(
+        "--static-dir",
+        default=STATIC_DIR,
+        help="Static directory the server serves, e.g. build/static (default: $PIVOTSTREAM_STATIC_DIR or static)",
+    )
+    parser.add_argument("--parse-words", type=int, default=5000)
+    parser.add_argument("--epub-chapters", type=int, default=40)
+    parser.add_argument("--epub-chapter-words", type=int, default=3000)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    payload = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(payload + "\n", encoding="utf-8")
+    else:
+        print(payload)
+
+    overall = report["overall"]
+    latency = overall["latency_ms"]
+    print(
+        f"{overall['requests']} requests, {overall['throughput_rps']} req/s, "
+        f"p50 {latency['p50']} ms, p95 {latency['p95']} ms, p99 {latency['p99']} ms, "
+        f"errors {overall['error_rate']:.2%}, timeouts {overall['timeout_rate']:.2%}, "
+        f"partial imports {overall['partial_rate']:.2%}, "
+        f"peak RSS {report['server_rss']['peak_kb']} kB",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,8 +4,10 @@ const inputText = document.getElementById("inputText");
 const loadSample = document.getElementById("loadSample");
 const epubFile = document.getElementById("epubFile");
 const loadEpub = document.getElementById("loadEpub");
+const lazyEpub = document.getElementById("lazyEpub");
 const pdfFile = document.getElementById("pdfFile");
 const loadPdf = document.getElementById("loadPdf");
+const importRange = document.getElementById("importRange");
 const parseStatus = document.getElementById("parseStatus");
 const parseSpinner = document.getElementById("parseSpinner");
 const chapterList = document.getElementById("chapterList");
@@ -32,6 +34,11 @@ const wordIndexEl = document.getElementById("wordIndex");
 const metaToggle = document.getElementById("metaToggle");
 const playStateEl = document.getElementById("playState");
 const themeToggle = document.getElementById("themeToggle");
+const searchPanel = document.getElementById("searchPanel");
+const searchForm = document.getElementById("searchForm");
+const searchInput = document.getElementById("searchInput");
+const searchResults = document.getElementById("searchResults");
+const searchStatus = document.getElementById("searchStatus");
 
 let tokens = [];
 let currentIndex = 0;
@@ -47,6 +54,13 @@ let chapters = [];
 let activeChapterIndex = null;
 let inputDebounceId = null;
 let chapterMode = "none";
+let documentId = null;
+let documentText = "";
+let activeCacheKey = null;
+let positionSaveId = null;
+let cacheDbPromise = null;
+let lazyBook = null;
+let importGeneration = 0;
 
 const INPUT_DEBOUNCE_MS = 150;
 
@@ -56,6 +70,15 @@ const RAMP_MAX_WPM = 1600;
 const WORDS_PER_PAGE = 300;
 const CHAPTER_LABEL_MAX = 52;
 const THEME_KEY = "pivotstream-theme";
+const LAST_DOCUMENT_KEY = "pivotstream-last-document";
+const CACHE_DB_NAME = "pivotstream-cache";
+const CACHE_MAX_BYTES = 200 * 1024 * 1024;
+const CACHE_QUOTA_SHARE = 0.5;
+const POSITION_SAVE_MS = 1000;
+const POSITION_SAVE_WORDS = 50;
+const LAZY_PART_CACHE_MAX = 6;
+const IMPORT_RETRY_LIMIT = 3;
+const IMPORT_RETRY_DELAY_MS = 1500;
 
 function setStatus(message) {
   parseStatus.textContent = message;
@@ -86,7 +109,7 @@ function setLoading(isLoading, message) {
       button.disabled = isLoading;
     }
   });
-  [epubFile, pdfFile].forEach((input) => {
+  [epubFile, pdfFile, importRange, lazyEpub].forEach((input) => {
     if (input) {
       input.disabled = isLoading;
     }
@@ -162,16 +185,118 @@ function closeShortcuts() {
   }
 }
 
+function pdfPagesLabel(pages, range) {
+  return range ? `PDF pages: ${range} of ${pages}` : `PDF pages: ${pages}`;
+}
+
 function clearChapters() {
   chapters = [];
   activeChapterIndex = null;
   chapterMode = "none";
+  lazyBook = null;
+  // Any new document abandons background continuation of a partial import.
+  importGeneration += 1;
   if (chapterList) {
     chapterList.innerHTML = "";
   }
   setChapterPanelMode("none", "No chapters loaded.");
 }
 
+function setSearchStatus(message) {
+  if (searchStatus) {
+    searchStatus.textContent = message;
+  }
+}
+
+function clearSearch() {
+  documentId = null;
+  documentText = "";
+  if (searchResults) {
+    searchResults.innerHTML = "";
+    searchResults.classList.add("is-hidden");
+  }
+  if (searchPanel) {
+    searchPanel.classList.add("is-hidden");
+  }
+  setSearchStatus("");
+}
+
+function enableSearch(id, stats, text) {
+  clearSearch();
+  if (!id || !searchPanel) {
+    return;
+  }
+  documentId = id;
+  documentText = text || "";
+  searchPanel.classList.remove("is-hidden");
+  if (stats && Number.isFinite(stats.terms)) {
+    setSearchStatus(`Indexed ${stats.terms} distinct words in ${stats.build_ms} ms.`);
+  }
+}
+
+function renderSearchResults(matches) {
+  if (!searchResults) {
+    return;
+  }
+  searchResults.innerHTML = "";
+  searchResults.classList.toggle("is-hidden", !matches.length);
+  matches.forEach((match) => {
+    const button = document.createElement("button");
+    button.type = "button";
+    button.className = "chapter-item";
+    button.textContent = match.snippet;
+    button.title = `Word ${match.index + 1}`;
+    button.addEventListener("click", () => jumpToIndex(match.index));
+    searchResults.appendChild(button);
+  });
+}
+
+async function registerDocument() {
+  // The server forgets documents (restart, LRU); re-index the text we already hold.
+  const response = await fetch("/api/documents", {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({ text: documentText }),
+  });
+  if (!response.ok) {
+    throw new Error("Search index unavailable");
+  }
+  const data = await response.json();
+  documentId = data.document_id;
+  if (activeCacheKey) {
+    updateCacheEntry(activeCacheKey, { documentId });
+  }
+}
+
+async function runSearch(query) {
+  if (!documentId || !query.trim()) {
+    return;
+  }
+  setSearchStatus("Searching...");
+  try {
+    const search = () =>
+      fetch(`/api/search?${new URLSearchParams({ document_id: documentId, q: query })}`);
+    let response = await search();
+    if (response.status === 404 && documentText) {
+      await registerDocument();
+      response = await search();
+    }
+    if (!response.ok) {
+      const errorPayload = await response.json();
+      throw new Error(errorPayload.detail || "Search failed");
+    }
+    const data = await response.json();
+    const matches = Array.isArray(data.matches) ? data.matches : [];
+    renderSearchResults(matches);
+    const shown = matches.length < data.total ? ` (showing ${matches.length})` : "";
+    setSearchStatus(`${data.total} matches${shown} in ${data.elapsed_ms} ms.`);
+  } catch (error) {
+    console.error(error);
+    renderSearchResults([]);
+    setSearchStatus(`Search failed: ${error.message}`);
+  }
+}
+
 function setActiveChapter(index) {
   if (!chapterList) {
     return;
@@ -209,6 +334,364 @@ function renderChapters() {
   });
 }
 
+function openCacheDb() {
+  if (!window.indexedDB) {
+    return Promise.resolve(null);
+  }
+  if (!cacheDbPromise) {
+    const request = window.indexedDB.open(CACHE_DB_NAME, 1);
+    request.onupgradeneeded = () => {
+      // Small "entries" records drive LRU and positions; "payloads" hold the tokens.
+      request.result.createObjectStore("entries", { keyPath: "key" });
+      request.result.createObjectStore("payloads", { keyPath: "key" });
+    };
+    cacheDbPromise = new Promise((resolve) => {
+      request.onsuccess = () => resolve(request.result);
+      request.onerror = () => {
+        console.warn("Token cache unavailable", request.error);
+        resolve(null);
+      };
+    });
+  }
+  return cacheDbPromise;
+}
+
+async function cacheTransaction(mode, work) {
+  const db = await openCacheDb();
+  if (!db) {
+    return null;
+  }
+  return new Promise((resolve, reject) => {
+    const tx = db.transaction(["entries", "payloads"], mode);
+    let result = null;
+    work(tx.objectStore("entries"), tx.objectStore("payloads"), (value) => {
+      result = value;
+    });
+    tx.oncomplete = () => resolve(result);
+    tx.onerror = () => reject(tx.error);
+    tx.onabort = () => reject(tx.error);
+  });
+}
+
+async function sha256Hex(buffer) {
+  if (!window.crypto?.subtle) {
+    return null;
+  }
+  const digest = await window.crypto.subtle.digest("SHA-256", buffer);
+  return Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, "0")).join("");
+}
+
+function importRangeValue() {
+  return importRange ? importRange.value.replace(/\s+/g, "") : "";
+}
+
+async function fileCacheKey(kind, file, range) {
+  try {
+    const hash = await sha256Hex(await file.arrayBuffer());
+    if (!hash) {
+      return null;
+    }
+    return range ? `${kind}:${hash}:${range}` : `${kind}:${hash}`;
+  } catch (error) {
+    console.warn("Could not hash file", error);
+    return null;
+  }
+}
+
+async function textCacheKey(text) {
+  try {
+    const hash = await sha256Hex(new TextEncoder().encode(text));
+    return hash ? `text:${hash}` : null;
+  } catch (error) {
+    console.warn("Could not hash text", error);
+    return null;
+  }
+}
+
+function estimatePayloadBytes(payload) {
+  const tokenBytes = payload.tokens.reduce(
+    (sum, token) => sum + 48 + 2 * (token.core.length + token.prefix.length + token.suffix.length),
+    0
+  );
+  return 2 * payload.text.length + tokenBytes + 128 * payload.chapters.length;
+}
+
+async function cacheBudgetBytes() {
+  try {
+    const estimate = await navigator.storage?.estimate?.();
+    if (estimate?.quota) {
+      return Math.min(CACHE_MAX_BYTES, estimate.quota * CACHE_QUOTA_SHARE);
+    }
+  } catch (error) {
+    console.warn("Storage estimate failed", error);
+  }
+  return CACHE_MAX_BYTES;
+}
+
+async function evictCache(keepKey) {
+  const budget = await cacheBudgetBytes();
+  const entries =
+    (await cacheTransaction("readonly", (entryStore, payloadStore, done) => {
+      entryStore.getAll().onsuccess = (event) => done(event.target.result);
+    })) || [];
+  let total = entries.reduce((sum, entry) => sum + (entry.size || 0), 0);
+  const victims = [];
+  entries
+    .filter((entry) => entry.key !== keepKey)
+    .sort((a, b) => a.lastAccess - b.lastAccess)
+    .forEach((entry) => {
+      if (total > budget) {
+        victims.push(entry.key);
+        total -= entry.size || 0;
+      }
+    });
+  if (victims.length) {
+    await cacheTransaction("readwrite", (entryStore, payloadStore) => {
+      victims.forEach((key) => {
+        entryStore.delete(key);
+        payloadStore.delete(key);
+      });
+    });
+  }
+}
+
+async function storeCachedDocument(key, entry, payload) {
+  if (!key) {
+    return;
+  }
+  try {
+    const record = {
+      ...entry,
+      key,
+      position: currentIndex,
+      size: estimatePayloadBytes(payload),
+      lastAccess: Date.now(),
+    };
+    await cacheTransaction("readwrite", (entryStore, payloadStore) => {
+      entryStore.put(record);
+      payloadStore.put({ key, ...payload });
+    });
+    activeCacheKey = key;
+    window.localStorage.setItem(LAST_DOCUMENT_KEY, key);
+    await evictCache(key);
+  } catch (error) {
+    console.warn("Could not cache document", error);
+  }
+}
+
+async function updateCacheEntry(key, changes) {
+  try {
+    await cacheTransaction("readwrite", (entryStore) => {
+      entryStore.get(key).onsuccess = (event) => {
+        const entry = event.target.result;
+        if (entry) {
+          entryStore.put({ ...entry, ...changes });
+        }
+      };
+    });
+  } catch (error) {
+    console.warn("Could not update cache entry", error);
+  }
+}
+
+async function revalidateCacheEntry(entry) {
+  // A lookup by document id is enough: only the parser version can invalidate tokens.
+  try {
+    const response = await fetch(`/api/documents/${encodeURIComponent(entry.documentId)}`);
+    if (!response.ok) {
+      return true;
+    }
+    const data = await response.json();
+    return data.parser_version === entry.parserVersion;
+  } catch (error) {
+    console.warn("Cache revalidation failed; using cached tokens", error);
+    return true;
+  }
+}
+
+async function restoreCachedDocument(key) {
+  if (!key) {
+    return false;
+  }
+  let entry = null;
+  let payload = null;
+  try {
+    await cacheTransaction("readonly", (entryStore, payloadStore) => {
+      entryStore.get(key).onsuccess = (event) => {
+        entry = event.target.result;
+      };
+      payloadStore.get(key).onsuccess = (event) => {
+        payload = event.target.result;
+      };
+    });
+  } catch (error) {
+    console.warn("Could not read token cache", error);
+    return false;
+  }
+  if (!entry || !payload) {
+    return false;
+  }
+  if (!(await revalidateCacheEntry(entry))) {
+    await cacheTransaction("readwrite", (entryStore, payloadStore) => {
+      entryStore.delete(key);
+      payloadStore.delete(key);
+    });
+    return false;
+  }
+
+  stopPlayback();
+  clearChapters();
+  tokens = payload.tokens || [];
+  inputText.innerText = payload.text || "";
+  inputRawText = payload.text || "";
+  buildInputSegments(inputRawText);
+  renderInputContent();
+  chapters = Array.isArray(payload.chapters) ? payload.chapters : [];
+  if (chapters.length) {
+    chapterMode = "epub";
+    renderChapters();
+  } else if (Number.isFinite(payload.pages)) {
+    chapterMode = "pdf";
+    setChapterPanelMode("pdf", pdfPagesLabel(payload.pages, payload.range));
+  }
+  activeCacheKey = key;
+  window.localStorage.setItem(LAST_DOCUMENT_KEY, key);
+  currentIndex = Math.min(Math.max(0, entry.position || 0), Math.max(tokens.length - 1, 0));
+  showToken(tokens[currentIndex]);
+  updateMeta();
+  highlightInputWord(currentIndex);
+  syncActiveChapter();
+  if (entry.kind !== "text") {
+    enableSearch(entry.documentId, null, payload.text);
+  }
+  setStatus(`Loaded ${tokens.length} words from cache.`);
+  setPlayState("Ready");
+  updateCacheEntry(key, { lastAccess: Date.now() });
+  return true;
+}
+
+function schedulePositionSave() {
+  if (!activeCacheKey || positionSaveId) {
+    return;
+  }
+  positionSaveId = window.setTimeout(savePosition, POSITION_SAVE_MS);
+}
+
+function savePosition() {
+  if (positionSaveId) {
+    window.clearTimeout(positionSaveId);
+    positionSaveId = null;
+  }
+  if (activeCacheKey) {
+    updateCacheEntry(activeCacheKey, { position: currentIndex, lastAccess: Date.now() });
+  }
+}
+
+function forgetActiveDocument() {
+  if (positionSaveId) {
+    window.clearTimeout(positionSaveId);
+    positionSaveId = null;
+  }
+  activeCacheKey = null;
+  window.localStorage.removeItem(LAST_DOCUMENT_KEY);
+}
+
+function syncActiveChapter() {
+  if (!chapters.length) {
+    return;
+  }
+  let active = 0;
+  chapters.forEach((chapter, index) => {
+    if ((chapter.start_index ?? 0) <= currentIndex) {
+      active = index;
+    }
+  });
+  setActiveChapter(active);
+}
+
+function fetchLazyPart(part) {
+  const book = lazyBook;
+  if (!book || part < 0 || part >= book.parts) {
+    return Promise.resolve(null);
+  }
+  if (book.cache.has(part)) {
+    const payload = book.cache.get(part);
+    book.cache.delete(part);
+    book.cache.set(part, payload);
+    return Promise.resolve(payload);
+  }
+  if (book.pending.has(part)) {
+    return book.pending.get(part);
+  }
+  const request = fetch(`/api/epub/${book.archiveId}/parts/${part}`)
+    .then(async (response) => {
+      if (!response.ok) {
+        const errorPayload = await response.json();
+        throw new Error(errorPayload.detail || "Chapter load failed");
+      }
+      return response.json();
+    })
+    .then((payload) => {
+      book.cache.set(part, payload);
+      while (book.cache.size > LAZY_PART_CACHE_MAX) {
+        book.cache.delete(book.cache.keys().next().value);
+      }
+      return payload;
+    })
+    .finally(() => book.pending.delete(part));
+  book.pending.set(part, request);
+  return request;
+}
+
+function showLazyPart(payload, startIndex) {
+  lazyBook.part = payload.part;
+  tokens = payload.tokens || [];
+  inputText.innerText = payload.text || "";
+  inputRawText = inputText.innerText;
+  buildInputSegments(inputRawText);
+  renderInputContent();
+  currentIndex = Math.min(Math.max(0, startIndex), Math.max(tokens.length - 1, 0));
+  showToken(tokens[currentIndex]);
+  updateMeta();
+  highlightInputWord(currentIndex);
+  const entries = payload.chapters || [];
+  const active = entries.filter((entry) => entry.start_index <= currentIndex).pop() || entries[0];
+  if (active) {
+    setActiveChapter(active.chapter);
+  }
+  // Read ahead so sequential playback rolls into the next chapter without a pause.
+  fetchLazyPart(payload.part + 1).catch((error) => console.warn("Read-ahead failed", error));
+}
+
+async function loadLazyPart(part, chapterIndex = null) {
+  const book = lazyBook;
+  const wasPlaying = isPlaying;
+  stopPlayback();
+  setPlayState("Loading chapter...");
+  let payload = null;
+  try {
+    payload = await fetchLazyPart(part);
+  } catch (error) {
+    console.error(error);
+    setStatus(`Could not load chapter: ${error.message}`);
+    setPlayState("Paused");
+    return;
+  }
+  if (!payload || lazyBook !== book) {
+    return;
+  }
+  const entry = (payload.chapters || []).find((item) => item.chapter === chapterIndex);
+  showLazyPart(payload, entry ? entry.start_index : 0);
+  if (wasPlaying) {
+    isPlaying = true;
+    inputText.contentEditable = "false";
+    startRamp();
+    scheduleNext();
+  } else {
+    setPlayState("Ready");
+  }
+}
+
 function showToken(token) {
   if (!token) {
     leftEl.textContent = "";
@@ -237,10 +720,10 @@ function escapeHtml(text) {
     .replace(/'/g, "&#39;");
 }
 
-function buildInputSegments(rawText) {
+function segmentText(rawText, firstWordIndex = 0) {
   const parts = rawText.match(/\s+|\S+/g) || [];
-  let wordIndex = 0;
-  inputSegments = parts.map((part) => {
+  let wordIndex = firstWordIndex;
+  return parts.map((part) => {
     const hasCore = /[\p{L}\p{N}]/u.test(part);
     const segment = {
       text: part,
@@ -254,13 +737,12 @@ function buildInputSegments(rawText) {
   });
 }
 
-function renderInputContent() {
-  if (!inputSegments.length) {
-    inputText.innerText = inputRawText;
-    activeWordEl = null;
-    return;
-  }
-  const html = inputSegments
+function buildInputSegments(rawText) {
+  inputSegments = segmentText(rawText);
+}
+
+function segmentsHtml(segments) {
+  return segments
     .map((segment) => {
       const escaped = escapeHtml(segment.text).replace(/\n/g, "<br>");
       if (segment.isWord) {
@@ -269,10 +751,33 @@ function renderInputContent() {
       return escaped;
     })
     .join("");
-  inputText.innerHTML = html;
+}
+
+function renderInputContent() {
+  if (!inputSegments.length) {
+    inputText.innerText = inputRawText;
+    activeWordEl = null;
+    return;
+  }
+  inputText.innerHTML = segmentsHtml(inputSegments);
   activeWordEl = null;
 }
 
+function appendInputText(text) {
+  // Extends the rendered input in place so long imports do not re-render the prefix.
+  if (!inputSegments.length) {
+    inputRawText += text;
+    buildInputSegments(inputRawText);
+    renderInputContent();
+    return;
+  }
+  const last = [...inputSegments].reverse().find((segment) => segment.isWord);
+  const added = segmentText(text, last ? last.wordIndex + 1 : 0);
+  inputRawText += text;
+  added.forEach((segment) => inputSegments.push(segment));
+  inputText.insertAdjacentHTML("beforeend", segmentsHtml(added));
+}
+
 function highlightInputWord(activeIndex) {
   if (!inputSegments.length) {
     return;
@@ -347,8 +852,13 @@ function scheduleNext() {
     return;
   }
   if (currentIndex >= tokens.length) {
+    if (lazyBook && lazyBook.part + 1 < lazyBook.parts) {
+      loadLazyPart(lazyBook.part + 1);
+      return;
+    }
     isPlaying = false;
     setPlayState("Finished");
+    savePosition();
     return;
   }
 
@@ -357,6 +867,9 @@ function scheduleNext() {
   updateMeta();
   setPlayState("Playing");
   highlightInputWord(currentIndex);
+  if (currentIndex % POSITION_SAVE_WORDS === 0) {
+    schedulePositionSave();
+  }
 
   // Chain timeouts so the delay can change per word and with WPM updates.
   const delay = computeDelay(token);
@@ -374,9 +887,10 @@ function stopPlayback() {
   isPlaying = false;
   inputText.contentEditable = "true";
   stopRamp();
+  savePosition();
 }
 
-async function parseText() {
+async function parseText({ useCache = true } = {}) {
   const text = inputText.innerText.trim();
   if (!text) {
     tokens = [];
@@ -389,6 +903,11 @@ async function parseText() {
     return false;
   }
 
+  const cacheKey = useCache ? await textCacheKey(text) : null;
+  if (cacheKey && (await restoreCachedDocument(cacheKey))) {
+    return tokens.length > 0;
+  }
+
   setStatus("Parsing...");
   try {
     const response = await fetch("/api/parse", {
@@ -412,6 +931,13 @@ async function parseText() {
     highlightInputWord(0);
     setStatus(`Loaded ${tokens.length} words.`);
     setPlayState("Ready");
+    if (cacheKey) {
+      await storeCachedDocument(
+        cacheKey,
+        { kind: "text", documentId: cacheKey.slice(5, 37), parserVersion: data.parser_version },
+        { text: inputRawText, tokens, chapters: [], pages: null }
+      );
+    }
     return tokens.length > 0;
   } catch (error) {
     console.error(error);
@@ -420,14 +946,111 @@ async function parseText() {
   }
 }
 
-function jumpWords(delta) {
+function importProgressLabel(progress) {
+  if (!progress) {
+    return "";
+  }
+  const unit = progress.unit === "page" ? "pages" : "sections";
+  return `Imported ${progress.done} of ${progress.total} ${unit}.`;
+}
+
+function showImportedChapters(kind, data, range) {
+  const list = Array.isArray(data.chapters) ? data.chapters : [];
+  if (list.length) {
+    chapters = list;
+    chapterMode = "epub";
+    renderChapters();
+    syncActiveChapter();
+  } else if (kind === "pdf" && Number.isFinite(data.pages)) {
+    chapterMode = "pdf";
+    setChapterPanelMode("pdf", pdfPagesLabel(data.pages, range));
+  }
+}
+
+function applyImportUpdate(kind, data, range) {
+  // Continuations carry only the new text and its tokens; earlier token indices
+  // are unchanged, so the reader keeps its place (even mid-playback).
+  if (data.token_offset !== tokens.length) {
+    throw new Error("Import continuation is out of sync");
+  }
+  const hadTokens = tokens.length > 0;
+  (data.tokens || []).forEach((token) => tokens.push(token));
+  appendInputText(data.text || "");
+  if (!isPlaying) {
+    showToken(tokens[currentIndex]);
+    if (!hadTokens) {
+      setPlayState("Ready");
+    }
+  }
+  updateMeta();
+  showImportedChapters(kind, data, range);
+  if (data.document_id) {
+    enableSearch(data.document_id, data.search_index, inputRawText);
+  }
+}
+
+async function fetchContinuation(continuation, offsets) {
+  // Offsets name what the client already holds, so a retry after a 408 or a lost
+  // response gets everything it missed instead of falling out of sync.
+  for (let attempt = 0; ; attempt += 1) {
+    let response = null;
+    try {
+      response = await fetch(`/api/imports/${continuation}`, {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body: JSON.stringify(offsets),
+      });
+    } catch (error) {
+      if (attempt >= IMPORT_RETRY_LIMIT) {
+        throw error;
+      }
+    }
+    if (response?.ok) {
+      return response.json();
+    }
+    if (response && (response.status !== 408 || attempt >= IMPORT_RETRY_LIMIT)) {
+      const errorPayload = await response.json();
+      throw new Error(errorPayload.detail || "Import failed");
+    }
+    await new Promise((resolve) => window.setTimeout(resolve, IMPORT_RETRY_DELAY_MS * (attempt + 1)));
+  }
+}
+
+async function continueImport(kind, data, range, onComplete) {
+  const generation = importGeneration;
+  let current = data;
+  try {
+    while (current.partial && current.continuation) {
+      setStatus(`${importProgressLabel(current.progress)} Continuing in the background...`);
+      const next = await fetchContinuation(current.continuation, {
+        text_offset: current.text_end,
+        token_offset: current.token_end,
+      });
+      if (generation !== importGeneration) {
+        return;
+      }
+      applyImportUpdate(kind, next, range);
+      current = next;
+    }
+    setStatus(`Loaded ${tokens.length} words.`);
+    await onComplete();
+  } catch (error) {
+    console.error(error);
+    if (generation === importGeneration) {
+      setStatus(`${importProgressLabel(current.progress)} Import stopped: ${error.message}`);
+    }
+  }
+}
+
+function jumpToIndex(index) {
   if (tokens.length === 0) {
     return;
   }
-  currentIndex = Math.min(Math.max(0, currentIndex + delta), tokens.length - 1);
+  currentIndex = Math.min(Math.max(0, index), tokens.length - 1);
   showToken(tokens[currentIndex]);
   updateMeta();
   highlightInputWord(currentIndex);
+  schedulePositionSave();
   if (isPlaying) {
     stopPlayback();
     isPlaying = true;
@@ -436,7 +1059,19 @@ function jumpWords(delta) {
   }
 }
 
+function jumpWords(delta) {
+  jumpToIndex(currentIndex + delta);
+}
+
 function jumpToChapter(index) {
+  if (lazyBook) {
+    const chapter = chapters[index];
+    if (chapter) {
+      setActiveChapter(index);
+      loadLazyPart(chapter.part, index);
+    }
+    return;
+  }
   if (!chapters.length || tokens.length === 0) {
     return;
   }
@@ -444,23 +1079,15 @@ function jumpToChapter(index) {
   if (!chapter) {
     return;
   }
-  const startIndex = Math.min(Math.max(0, chapter.start_index ?? 0), tokens.length - 1);
-  currentIndex = startIndex;
-  showToken(tokens[currentIndex]);
-  updateMeta();
-  highlightInputWord(currentIndex);
   setActiveChapter(index);
-  if (isPlaying) {
-    stopPlayback();
-    isPlaying = true;
-    inputText.contentEditable = "false";
-    scheduleNext();
-  }
+  jumpToIndex(chapter.start_index ?? 0);
 }
 
 loadSample.addEventListener("click", () => {
   inputText.innerText = sampleText;
   clearChapters();
+  clearSearch();
+  forgetActiveDocument();
   setStatus("Sample loaded.");
   inputText.dispatchEvent(new Event("input"));
 });
@@ -484,9 +1111,25 @@ loadEpub.addEventListener("click", async () => {
   rampEnabled = true;
   stopRamp();
   setLoading(true, "Importing EPUB...");
+  clearChapters();
+  clearSearch();
+  forgetActiveDocument();
   try {
+    const range = importRangeValue();
+    const lazy = Boolean(lazyEpub?.checked) && !range;
+    const cacheKey = lazy ? null : await fileCacheKey("epub", file, range);
+    if (await restoreCachedDocument(cacheKey)) {
+      setLoading(false);
+      return;
+    }
     const formData = new FormData();
     formData.append("file", file);
+    if (range) {
+      formData.append("chapters", range);
+    }
+    if (lazy) {
+      formData.append("lazy", "true");
+    }
     const response = await fetch("/api/epub", {
       method: "POST",
       body: formData,
@@ -496,15 +1139,47 @@ loadEpub.addEventListener("click", async () => {
       throw new Error(errorPayload.detail || "EPUB import failed");
     }
     const data = await response.json();
+    if (data.lazy) {
+      stopPlayback();
+      chapters = Array.isArray(data.chapters) ? data.chapters : [];
+      chapterMode = "epub";
+      lazyBook = {
+        archiveId: data.archive_id,
+        parts: data.parts,
+        part: 0,
+        cache: new Map([[0, data.part]]),
+        pending: new Map(),
+      };
+      renderChapters();
+      showLazyPart(data.part, 0);
+      setPlayState("Ready");
+      setLoading(false, `Loaded ${chapters.length} chapters; each one loads when you reach it.`);
+      return;
+    }
     chapters = Array.isArray(data.chapters) ? data.chapters : [];
     chapterMode = "epub";
     inputText.innerText = data.text || "";
-    const parsed = await parseText();
+    const parsed = await parseText({ useCache: false });
     renderChapters();
     if (parsed && chapters.length) {
       setActiveChapter(0);
     }
+    const cacheDocument = () =>
+      storeCachedDocument(
+        cacheKey,
+        { kind: "epub", name: file.name, documentId, parserVersion: data.parser_version },
+        { text: inputRawText, tokens, chapters, pages: null }
+      );
+    if (parsed) {
+      enableSearch(data.document_id, data.search_index, data.text);
+      if (!data.partial) {
+        await cacheDocument();
+      }
+    }
     setLoading(false);
+    if (data.partial) {
+      continueImport("epub", data, range, cacheDocument);
+    }
   } catch (error) {
     console.error(error);
     setLoading(false, `Could not import EPUB: ${error.message}`);
@@ -522,9 +1197,20 @@ if (loadPdf && pdfFile) {
     stopRamp();
     setLoading(true, "Importing PDF...");
     clearChapters();
+    clearSearch();
+    forgetActiveDocument();
     try {
+      const range = importRangeValue();
+      const cacheKey = await fileCacheKey("pdf", file, range);
+      if (await restoreCachedDocument(cacheKey)) {
+        setLoading(false);
+        return;
+      }
       const formData = new FormData();
       formData.append("file", file);
+      if (range) {
+        formData.append("pages", range);
+      }
       const response = await fetch("/api/pdf", {
         method: "POST",
         body: formData,
@@ -535,7 +1221,7 @@ if (loadPdf && pdfFile) {
       }
     const data = await response.json();
     inputText.innerText = data.text || "";
-    const parsed = await parseText();
+    const parsed = await parseText({ useCache: false });
     const sections = Array.isArray(data.chapters) ? data.chapters : [];
     if (sections.length) {
       chapters = sections;
@@ -546,9 +1232,30 @@ if (loadPdf && pdfFile) {
       }
     } else if (Number.isFinite(data.pages)) {
       chapterMode = "pdf";
-      setChapterPanelMode("pdf", `PDF pages: ${data.pages}`);
+      setChapterPanelMode("pdf", pdfPagesLabel(data.pages, range));
+    }
+    const cacheDocument = () =>
+      storeCachedDocument(
+        cacheKey,
+        { kind: "pdf", name: file.name, documentId, parserVersion: data.parser_version },
+        {
+          text: inputRawText,
+          tokens,
+          chapters,
+          pages: Number.isFinite(data.pages) ? data.pages : null,
+          range,
+        }
+      );
+    if (parsed) {
+      enableSearch(data.document_id, data.search_index, data.text);
+      if (!data.partial) {
+        await cacheDocument();
+      }
     }
     setLoading(false);
+    if (data.partial) {
+      continueImport("pdf", data, range, cacheDocument);
+    }
   } catch (error) {
     console.error(error);
     setLoading(false, `Could not import PDF: ${error.message}`);
@@ -563,6 +1270,8 @@ inputText.addEventListener("input", () => {
   showToken(null);
   updateMeta();
   clearChapters();
+  clearSearch();
+  forgetActiveDocument();
   inputRawText = inputText.innerText;
   rampEnabled = true;
   setPlayState("Idle");
@@ -614,13 +1323,17 @@ resumeButton.addEventListener("click", () => {
   scheduleNext();
 });
 
-restartButton.addEventListener("click", () => {
+restartButton.addEventListener("click", async () => {
   stopPlayback();
+  if (lazyBook && lazyBook.part !== 0) {
+    await loadLazyPart(0);
+  }
   currentIndex = 0;
   showToken(tokens[0]);
   updateMeta();
   highlightInputWord(0);
   setPlayState("Restarted");
+  savePosition();
 });
 
 back10Button.addEventListener("click", () => jumpWords(-10));
@@ -632,6 +1345,13 @@ stableButton.addEventListener("click", () => {
   setStatus("Speed stabilized. Press Play to keep current WPM.");
 });
 
+if (searchForm && searchInput) {
+  searchForm.addEventListener("submit", (event) => {
+    event.preventDefault();
+    runSearch(searchInput.value);
+  });
+}
+
 metaToggle.addEventListener("click", () => {
   metaMode = metaMode === "words" ? "percent" : "words";
   updateMeta();
@@ -697,6 +1417,11 @@ document.addEventListener("keydown", (event) => {
     stableButton.click();
     return;
   }
+  if (key === "/" && documentId && searchInput) {
+    event.preventDefault();
+    searchInput.focus();
+    return;
+  }
   if (key === "?") {
     event.preventDefault();
     openShortcuts();
@@ -713,3 +1438,7 @@ inputRawText = inputText.innerText;
 buildInputSegments(inputRawText);
 renderInputContent();
 clearChapters();
+clearSearch();
+
+window.addEventListener("pagehide", savePosition);
+restoreCachedDocument(window.localStorage.getItem(LAST_DOCUMENT_KEY));
@@ -1,10 +1,28 @@
+import asyncio
+import gc
 import io
+import threading
+import time
 import zipfile
 
 import pytest
 from pypdf import PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
 
-from main import _extract_epub_data, _extract_pdf_data, _extract_pdf_sections
+import main
+from main import (
+    _begin_import,
+    _continue_import,
+    _extract_epub_data,
+    _extract_pdf_data,
+    _extract_pdf_sections,
+    _lazy_epub_part,
+    _open_lazy_epub_first_part,
+    _parse_range_spec,
+    _register_document,
+    _start_epub_import,
+    _start_pdf_import,
+)
 
 
 CONTAINER_XML = """<?xml version="1.0"?>
@@ -110,3 +128,233 @@ I. Introduction
     assert "I Introduction" in titles
     assert not any("136.01" in title for title in titles)
     assert not any(title.startswith("0 ") for title in titles)
+
+
+def make_multi_chapter_epub(count: int = 4) -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("META-INF/container.xml", CONTAINER_XML)
+        items = ['<item id="nav" href="toc.xhtml" media-type="application/xhtml+xml" properties="nav" />']
+        refs = []
+        links = []
+        for idx in range(1, count + 1):
+            items.append(f'<item id="c{idx}" href="c{idx}.xhtml" media-type="application/xhtml+xml" />')
+            refs.append(f'<itemref idref="c{idx}" />')
+            links.append(f'<li><a href="c{idx}.xhtml">Part {idx}</a></li>')
+            zf.writestr(
+                f"OEBPS/c{idx}.xhtml",
+                f'<html xmlns="http://www.w3.org/1999/xhtml"><body><h1>Part {idx}</h1>'
+                f"<p>Body of part {idx}.</p></body></html>",
+            )
+        zf.writestr(
+            "OEBPS/content.opf",
+            '<package xmlns="http://www.idpf.org/2007/opf" version="3.0">'
+            f"<manifest>{''.join(items)}</manifest><spine>{''.join(refs)}</spine></package>",
+        )
+        zf.writestr(
+            "OEBPS/toc.xhtml",
+            '<html xmlns="http://www.w3.org/1999/xhtml"><body>'
+            f'<nav epub:type="toc"><ol>{"".join(links)}</ol></nav></body></html>',
+        )
+    return buf.getvalue()
+
+
+def make_text_pdf(pages: list[str]) -> bytes:
+    writer = PdfWriter()
+    font = DictionaryObject(
+        {
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject("/Helvetica"),
+        }
+    )
+    font_ref = writer._add_object(font)
+    for text in pages:
+        page = writer.add_blank_page(width=300, height=100)
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 12 Tf 10 50 Td ({text}) Tj ET".encode())
+        page[NameObject("/Contents")] = writer._add_object(stream)
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font_ref})}
+        )
+    buf = io.BytesIO()
+    writer.write(buf)
+    return buf.getvalue()
+
+
+def test_extract_epub_chapter_subset_rebases_offsets():
+    data = make_multi_chapter_epub(4)
+    text, chapters = _extract_epub_data(data, chapters="2-3")
+    assert "part 2" in text and "part 3" in text
+    assert "part 1" not in text and "part 4" not in text
+    assert [chapter["title"] for chapter in chapters] == ["Part 2", "Part 3"]
+    assert chapters[0]["start_index"] == 0
+    assert chapters[1]["start_index"] == 6
+
+
+def test_extract_epub_spine_subset():
+    data = make_multi_chapter_epub(4)
+    text, chapters = _extract_epub_data(data, spine="4")
+    assert "part 4" in text and "part 3" not in text
+    assert [chapter["title"] for chapter in chapters] == ["Part 4"]
+
+
+def test_extract_pdf_page_range():
+    data = make_text_pdf(["Alpha page", "Bravo page", "Charlie page", "Delta page"])
+    text, pages, _ = _extract_pdf_data(data, pages="2-3")
+    assert pages == 4
+    assert "Bravo" in text and "Charlie" in text
+    assert "Alpha" not in text and "Delta" not in text
+
+
+def test_parse_range_spec_rejects_bad_input():
+    assert _parse_range_spec("3-5, 1", 10, "page") == [0, 2, 3, 4]
+    assert _parse_range_spec("8-20", 10, "page") == [7, 8, 9]
+    with pytest.raises(ValueError, match="out of range"):
+        _parse_range_spec("11", 10, "page")
+    with pytest.raises(ValueError, match="Invalid page range"):
+        _parse_range_spec("5-2", 10, "page")
+
+
+def test_lazy_epub_parts_follow_toc():
+    data = make_multi_chapter_epub(3)
+    archive_id, book, first = _open_lazy_epub_first_part(data)
+    assert len(book["parts"]) == 3
+    assert [entry["part"] for entry in book["entries"]] == [0, 1, 2]
+    assert "part 1" in first["text"] and "part 2" not in first["text"]
+    assert first["tokens"][0]["core"] == "Part"
+    assert first["chapters"] == [{"chapter": 0, "start_index": 0}]
+    third = _lazy_epub_part(archive_id, 2)
+    assert "part 3" in third["text"]
+    assert _lazy_epub_part(archive_id, 2) is third
+    with pytest.raises(IndexError):
+        _lazy_epub_part(archive_id, 3)
+    with pytest.raises(KeyError):
+        _lazy_epub_part("unknown", 0)
+
+
+def test_lazy_epub_part_decodes_once_under_concurrent_requests(monkeypatch):
+    data = make_multi_chapter_epub(3)
+    archive_id, _, _ = _open_lazy_epub_first_part(data)
+    reads = []
+    read_spine_item = main._read_spine_item
+
+    def slow_read(zf, item):
+        reads.append(item["href"])
+        time.sleep(0.05)
+        return read_spine_item(zf, item)
+
+    monkeypatch.setattr(main, "_read_spine_item", slow_read)
+    results = []
+    workers = [
+        threading.Thread(target=lambda: results.append(_lazy_epub_part(archive_id, 1)))
+        for _ in range(3)
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert len(reads) == 1
+    assert results[0] is results[1] is results[2]
+
+
+def test_lazy_part_of_evicted_book_is_not_cached(monkeypatch):
+    data = make_multi_chapter_epub(5)
+    archive_id, _, _ = _open_lazy_epub_first_part(data)
+    read_spine_item = main._read_spine_item
+
+    def evicting_read(zf, item):
+        main._lazy_books.pop(archive_id, None)
+        return read_spine_item(zf, item)
+
+    monkeypatch.setattr(main, "_read_spine_item", evicting_read)
+    assert "part 2" in _lazy_epub_part(archive_id, 1)["text"]
+    assert (archive_id, 1) not in main._lazy_parts
+
+
+def test_read_ahead_of_evicted_book_retrieves_its_error():
+    data = make_multi_chapter_epub(6)
+    archive_id, _, _ = _open_lazy_epub_first_part(data)
+    unhandled = []
+
+    async def scenario():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        main._read_ahead(archive_id, 1)
+        main._lazy_books.pop(archive_id)
+        tasks = list(main._background_tasks)
+        await asyncio.wait(tasks)
+        tasks.clear()
+        gc.collect()
+
+    asyncio.run(scenario())
+    assert unhandled == []
+    assert not main._background_tasks
+
+
+def test_pdf_import_stops_at_deadline_and_continues():
+    data = make_text_pdf(["Alpha page", "Bravo page", "Charlie page"])
+    first = _begin_import(_start_pdf_import, 0.0, data, None)
+    assert first["partial"] is True
+    assert first["text"] == "Alpha page"
+    assert first["progress"] == {"unit": "page", "done": 1, "total": 3, "resume_at": 2}
+    assert first["document_id"] is None and "tokens" not in first
+
+    # Continuations send only the new text and its tokens, offset into the whole.
+    second = _continue_import(first["continuation"], 0.0)
+    assert second["text"].split() == ["Bravo", "page"]
+    assert second["text_offset"] == len(first["text"])
+    assert second["token_offset"] == 2
+    assert [token["core"] for token in second["tokens"]] == ["Bravo", "page"]
+    assert second["progress"]["resume_at"] == 3
+    assert second["document_id"] is None
+
+    final = _continue_import(first["continuation"], None, second["text_end"], second["token_end"])
+    assert final["partial"] is False
+    assert final["continuation"] is None
+    assert final["text"].split() == ["Charlie", "page"]
+    assert final["token_offset"] == 4 and final["token_end"] == 6
+    assert final["document_id"] == _register_document(first["text"] + second["text"] + final["text"])[0]
+
+
+def test_import_continuation_replays_from_client_offsets():
+    data = make_text_pdf(["Alpha page", "Bravo page", "Charlie page"])
+    first = _begin_import(_start_pdf_import, 0.0, data, None)
+    lost = _continue_import(first["continuation"], 0.0, first["text_end"], first["token_end"])
+    assert lost["text"].split() == ["Bravo", "page"]
+
+    # The client never saw `lost`, so it resumes from the first response's offsets.
+    retry = _continue_import(first["continuation"], None, first["text_end"], first["token_end"])
+    assert retry["partial"] is False
+    assert [token["core"] for token in retry["tokens"]] == ["Bravo", "page", "Charlie", "page"]
+    assert retry["token_offset"] == 2
+
+    # A lost final response can be replayed too.
+    replay = _continue_import(first["continuation"], None, first["text_end"], first["token_end"])
+    assert replay["text"] == retry["text"]
+    with pytest.raises(ValueError, match="do not match"):
+        _continue_import(first["continuation"], None, first["text_end"], 3)
+
+
+def test_epub_partial_import_truncates_chapters():
+    data = make_multi_chapter_epub(3)
+    first = _begin_import(_start_epub_import, 0.0, data, None, None)
+    assert first["partial"] is True
+    assert [chapter["title"] for chapter in first["chapters"]] == ["Part 1"]
+    assert first["progress"] == {"unit": "spine_item", "done": 1, "total": 3, "resume_at": 2}
+
+    final = _continue_import(first["continuation"], None)
+    assert [chapter["title"] for chapter in final["chapters"]] == ["Part 1", "Part 2", "Part 3"]
+    assert final["text"].startswith("\n\nPart 2")
+    assert final["token_offset"] == len(first["text"].split())
+    assert final["search_index"]["tokens"] == final["token_offset"] + len(final["tokens"])
+
+
+def test_import_continuation_waits_for_a_running_attempt():
+    data = make_text_pdf(["Alpha page", "Bravo page"])
+    first = _begin_import(_start_pdf_import, 0.0, data, None)
+    state = main._import_states[first["continuation"]]
+    with state["lock"]:
+        with pytest.raises(TimeoutError, match="already in progress"):
+            _continue_import(first["continuation"], time.monotonic() + 0.05)
+    assert _continue_import(first["continuation"], time.monotonic() + 5)["partial"] is False
+
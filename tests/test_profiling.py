@@ -0,0 +1,135 @@
+import pstats
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import main
+from tests.test_imports import make_text_pdf
+
+
+def make_request(token: str | None = None, query_string: bytes = b"") -> Request:
+    headers = [(b"x-profile-token", token.encode())] if token else []
+    return Request({"type": "http", "method": "GET", "headers": headers, "query_string": query_string})
+
+
+def test_profiled_call_stores_pstats_and_collapsed(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "PROFILE_TOKEN", "secret")
+    tokens = main._profiled_call("abc", "parse", main.parse_text, "Hello profiled world. " * 200)
+    assert len(tokens) == 600
+
+    request = make_request("secret")
+    listing = main.profiles_endpoint(request)["profiles"]
+    assert listing[0]["id"] == "abc" and listing[0]["status"] == "ok"
+
+    raw = main.profile_download_endpoint("abc", request, format="pstats")
+    path = tmp_path / "profile.pstats"
+    path.write_bytes(raw.body)
+    stats = pstats.Stats(str(path))
+    assert any(name == "parse_text" for _, _, name in stats.stats)
+
+    collapsed = main.profile_download_endpoint("abc", request, format="collapsed").body.decode()
+    first = collapsed.splitlines()[0]
+    stack, micros = first.rsplit(" ", 1)
+    assert int(micros) > 0
+    assert any("parse_text" in line and "_split_token" in line for line in collapsed.splitlines())
+
+
+def test_profiles_require_token(monkeypatch):
+    monkeypatch.setattr(main, "PROFILE_TOKEN", "")
+    assert main._has_profile_token(make_request("anything")) is False
+    with pytest.raises(HTTPException) as disabled:
+        main.profiles_endpoint(make_request("anything"))
+    assert disabled.value.status_code == 404
+
+    monkeypatch.setattr(main, "PROFILE_TOKEN", "secret")
+    with pytest.raises(HTTPException) as forbidden:
+        main.profiles_endpoint(make_request("wrong"))
+    assert forbidden.value.status_code == 403
+
+
+def test_concurrent_profiles_fall_back_to_unprofiled(monkeypatch):
+    monkeypatch.setattr(main, "PROFILE_TOKEN", "secret")
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+        return "first"
+
+    first = threading.Thread(target=main._profiled_call, args=("first", "slow", slow))
+    first.start()
+    started.wait(5)
+    try:
+        assert main._profiled_call("second", "parse", main.parse_text, "Still parsed.")[0].core == "Still"
+    finally:
+        release.set()
+        first.join()
+
+    request = make_request("secret")
+    statuses = {entry["id"]: entry["status"] for entry in main.profiles_endpoint(request)["profiles"]}
+    assert statuses["first"] == "ok" and statuses["second"] == "busy"
+    with pytest.raises(HTTPException) as skipped:
+        main.profile_download_endpoint("second", request)
+    assert skipped.value.status_code == 409
+
+
+def test_profiler_conflict_does_not_fail_request(monkeypatch):
+    class ActiveProfiler:
+        def enable(self):
+            raise ValueError("Another profiling tool is already active")
+
+    monkeypatch.setattr(main.cProfile, "Profile", ActiveProfiler)
+    assert main._profiled_call("clash", "parse", main.parse_text, "Hello.")[0].core == "Hello"
+    assert main._profiles["clash"]["status"] == "unavailable"
+    assert not main._profiler_lock.locked()
+
+
+def test_profile_records_import_cutoff():
+    data = make_text_pdf(["Alpha page", "Bravo page"])
+    result = main._profiled_call(
+        "cutoff", "pdf", main._begin_import, main._start_pdf_import, 0.0, data, None
+    )
+    assert result["partial"] is True
+    assert main._profiles["cutoff"]["cutoff"] == result["progress"]
+
+
+def test_collapsed_stacks_are_built_on_download(monkeypatch):
+    monkeypatch.setattr(main, "PROFILE_TOKEN", "secret")
+    main._profiled_call("lazy", "parse", main.parse_text, "Folded later. " * 50)
+    assert "collapsed" not in main._profiles["lazy"]
+    body = main.profile_download_endpoint("lazy", make_request("secret"), format="collapsed").body
+    assert main._profiles["lazy"]["collapsed"] == body.decode()
+
+
+def test_collapse_stats_bounds_diamond_call_graphs():
+    # n0 -> (a1 | b1) -> n1 -> (a2 | b2) -> n2 ... has 2**40 distinct call paths.
+    def func(name):
+        return ("mod.py", 1, name)
+
+    layers = 40
+    stats = {func("n0"): (1, 1, 0.0, 1.0, {})}
+    for layer in range(1, layers + 1):
+        parent = func(f"n{layer - 1}")
+        for side in ("a", "b"):
+            stats[func(f"{side}{layer}")] = (1, 1, 0.0, 1.0, {parent: (1, 1, 0.0, 0.5)})
+        callers = {func(f"{side}{layer}"): (1, 1, 0.0, 0.5) for side in ("a", "b")}
+        self_time = 1.0 / layers
+        stats[func(f"n{layer}")] = (2, 2, self_time, 1.0, callers)
+    started = time.perf_counter()
+    collapsed = main._collapse_stats(stats)
+    assert time.perf_counter() - started < 1.0
+    assert 0 < len(collapsed.splitlines()) < 10_000
+
+
+def test_profile_token_is_header_only_and_rejects_non_ascii(monkeypatch):
+    monkeypatch.setattr(main, "PROFILE_TOKEN", "secret")
+    assert main._has_profile_token(make_request(query_string=b"profile_token=secret")) is False
+    assert main._has_profile_token(make_request(query_string=b"profile_token=%C3%A9")) is False
+    non_ascii = Request(
+        {"type": "http", "method": "GET", "headers": [(b"x-profile-token", "é".encode())], "query_string": b""}
+    )
+    assert main._has_profile_token(non_ascii) is False
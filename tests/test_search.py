@@ -0,0 +1,67 @@
+import json
+import tracemalloc
+
+from main import (
+    PARSER_VERSION,
+    _build_search_index,
+    _register_document,
+    _search_index,
+    document_lookup_endpoint,
+    parse_text,
+)
+
+
+def tracemalloc_size(fn, *args) -> int:
+    tracemalloc.start()
+    try:
+        result = fn(*args)
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return size
+
+
+TEXT = """It is a truth universally acknowledged, that a single man
+in possession of a good fortune, must be in want of a wife. "A Truth!" she said."""
+
+
+def test_search_index_matches_token_positions():
+    index = _build_search_index(TEXT)
+    tokens = parse_text(TEXT)
+    total, matches = _search_index(TEXT, index, "truth", 10)
+    assert total == 2
+    assert [tokens[m["index"]].core.casefold() for m in matches] == ["truth", "truth"]
+    assert "universally acknowledged" in matches[0]["snippet"]
+
+
+def test_search_index_phrase_query():
+    index = _build_search_index(TEXT)
+    total, matches = _search_index(TEXT, index, "a good FORTUNE", 10)
+    assert total == 1
+    assert parse_text(TEXT)[matches[0]["index"]].core == "a"
+    total, _ = _search_index(TEXT, index, "good wife", 10)
+    assert total == 0
+
+
+def test_search_index_is_small_relative_to_tokens():
+    text = " ".join(TEXT for _ in range(200))
+    document_id, stats = _register_document(text)
+    assert len(document_id) == 32
+    token_table = json.dumps([token.model_dump() for token in parse_text(text)])
+    assert stats["tokens"] == len(parse_text(text))
+    assert stats["bytes"] < len(token_table) / 4
+
+
+def test_search_index_bytes_include_object_overhead():
+    # A large vocabulary is dominated by per-term str/array headers.
+    text = " ".join(f"term{i}" for i in range(5000))
+    stats = _build_search_index(text)["stats"]
+    assert stats["bytes"] >= tracemalloc_size(_build_search_index, text) * 0.9
+
+
+def test_document_lookup_reports_parser_version():
+    document_id, _ = _register_document("Cached tokens stay valid.")
+    payload = document_lookup_endpoint(document_id)
+    assert payload == {"document_id": document_id, "indexed": True, "parser_version": PARSER_VERSION}
+    assert document_lookup_endpoint("missing")["indexed"] is False
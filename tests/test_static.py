@@ -0,0 +1,47 @@
+import asyncio
+import gzip
+
+from main import IMMUTABLE_CACHE_CONTROL, REVALIDATE_CACHE_CONTROL, PrecompressedStaticFiles
+
+
+def get(files, path, **headers):
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    }
+    return asyncio.run(files.get_response(path, scope))
+
+
+def test_fingerprinted_assets_are_immutable_and_precompressed(tmp_path):
+    (tmp_path / "app.0123456789.js").write_text("console.log('hi');")
+    (tmp_path / "app.0123456789.js.gz").write_bytes(gzip.compress(b"console.log('hi');"))
+    (tmp_path / "index.html").write_text("<html></html>")
+    files = PrecompressedStaticFiles(directory=tmp_path, html=True)
+
+    response = get(files, "app.0123456789.js", accept_encoding="br, gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.media_type.startswith("text/javascript")
+
+    plain = get(files, "app.0123456789.js")
+    assert "content-encoding" not in plain.headers
+
+    index = get(files, "index.html")
+    assert index.headers["cache-control"] == REVALIDATE_CACHE_CONTROL
+    assert get(files, "index.html", if_none_match=index.headers["etag"]).status_code == 304
+
+
+def test_rebuilt_variants_are_restatted(tmp_path):
+    (tmp_path / "index.html").write_text("<html></html>")
+    (tmp_path / "index.html.gz").write_bytes(gzip.compress(b"<html></html>"))
+    files = PrecompressedStaticFiles(directory=tmp_path, html=True)
+    before = get(files, "index.html", accept_encoding="gzip")
+
+    body = "<html>" + "rebuilt " * 500 + "</html>"
+    (tmp_path / "index.html").write_text(body)
+    (tmp_path / "index.html.gz").write_bytes(gzip.compress(body.encode(), mtime=0))
+    after = get(files, "index.html", accept_encoding="gzip")
+    assert int(after.headers["content-length"]) == (tmp_path / "index.html.gz").stat().st_size
+    assert after.headers["etag"] != before.headers["etag"]